@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt.token_blacklist",
     "drf_spectacular",
@@ -73,8 +74,19 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.routers.PrimaryPinMiddleware",
 ]
 
+# Serve the hot read endpoints with asynchronous views, see core.async_views.
+# Enabled by config.asgi unless set explicitly.
+ASYNC_READS = bool(os.getenv("ASYNC_READS", 0))
+
+if ASYNC_READS:
+    # The debug toolbar middleware is synchronous only
+    # and would run every asynchronous view in a thread
+    MIDDLEWARE.remove("debug_toolbar.middleware.DebugToolbarMiddleware")
+    SILENCED_SYSTEM_CHECKS = ["debug_toolbar.W001"]
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -110,6 +122,47 @@ DATABASES = {
     }
 }
 
+# "POSTGRES_REPLICA_HOSTS" is a comma separated list of read replica hosts,
+# which share the credentials of the primary.
+for index, host in enumerate(
+    filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(","))
+):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+
+# Seconds for which users read from the primary after their writes,
+# longer than the replication lag
+REPLICA_PIN_WINDOW = int(os.getenv("REPLICA_PIN_WINDOW", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# "CACHE_URL" should be a Redis URL. The local memory cache is used without it.
+CACHE_URL = os.getenv("CACHE_URL")
+
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+        if CACHE_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    )
+}
+
+RESPONSE_CACHE_TIMEOUT = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -156,6 +209,35 @@ STATIC_URL = "static/"
 MEDIA_ROOT = "/vol/web/media"
 MEDIA_URL = "/media/"
 
+STORAGES = {
+    "default": {
+        "BACKEND": "core.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+# How long unreferenced blobs are kept before `collect_blobs` removes them
+BLOB_GC_GRACE = timedelta(hours=1)
+
+# Longest side in pixels of each resized variant of uploaded images
+IMAGE_VARIANTS = {
+    "thumbnail": 160,
+    "feed": 720,
+    "full": 1600,
+}
+IMAGE_VARIANT_FORMATS = ("webp", "jpeg")
+IMAGE_VARIANT_QUALITY = 80
+
+# Chunked uploads are written here until they are attached to a post
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR", "/vol/web/uploads")
+UPLOAD_MAX_SIZE = 5_000_000
+UPLOAD_EXPIRY = timedelta(days=1)
+
+# The follow graph is exported here to compute follow recommendations
+RECOMMENDATIONS_DIR = os.getenv("RECOMMENDATIONS_DIR", "/vol/web/graph")
+RECOMMENDATIONS_SIZE = 20
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -164,26 +246,46 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "core.throttling.AnonThrottle",
+        "core.throttling.UserThrottle",
+        "core.throttling.ScopedThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "2000/day",
         "user": "10000/day",
+        "home": "60/min",
+        "search": "30/min",
+        "uploads": "100/hour",
     },
 }
 
+# Set by the benchmark services, whose load is sent as one user
+if os.getenv("DISABLE_THROTTLING"):
+    REST_FRAMEWORK["DEFAULT_THROTTLE_CLASSES"] = []
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "CHECK_REVOKE_TOKEN": True,
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "users.serializers.TokenVerifySerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "users.serializers.LogoutSerializer",
 }
 
+# Bits and hashes of the Bloom filter of blacklisted refresh tokens,
+# under 0.1% false positives up to a million unexpired tokens
+TOKEN_BLACKLIST_FILTER_SIZE = 2**24
+TOKEN_BLACKLIST_FILTER_HASHES = 7
+
+# Seconds for which authenticated users are resolved from the cache
+AUTH_CACHE_TIMEOUT = 60
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Social Media API",
     "DESCRIPTION": "REST API for a social media platform",
@@ -191,15 +293,80 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Home timelines are materialized per user on publish. Use
+# "posts.timelines.RedisTimelineBackend" to keep them in Redis instead.
+TIMELINE_BACKEND = os.getenv(
+    "TIMELINE_BACKEND", "posts.timelines.DatabaseTimelineBackend"
+)
+TIMELINE_MAX_LENGTH = 800
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_FAN_OUT_BATCH_SIZE = 1000
+
+# New post streams, served under ASGI only. Messages are relayed through
+# Redis pub/sub, or in-process with the local stand-in of REDIS_URL.
+STREAM_HEARTBEAT = 15
+STREAM_MAX_AGE = 5 * 60
+PUBSUB_QUEUE_SIZE = 100
+
+# Post search uses a GIN-indexed tsvector column on PostgreSQL and an
+# in-process inverted index elsewhere, unless a backend is set explicitly
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND")
+# Text search configuration of stored post vectors and of queries,
+# so changing it requires recomputing the vectors of existing posts
+SEARCH_CONFIG = "english"
+SEARCH_RECENCY_HALF_LIFE = timedelta(days=7)
+SEARCH_MAX_RESULTS = 1000
+
+TRENDING_TAGS_SIZE = 50
+
+# Profile search uses trigram indexes on PostgreSQL
+# and substring matching elsewhere, unless a backend is set explicitly
+PROFILE_SEARCH_BACKEND = os.getenv("PROFILE_SEARCH_BACKEND")
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = os.getenv("CELERY_TIMEZONE")
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Image processing is CPU bound and runs on a dedicated worker pool
+CELERY_TASK_ROUTES = {
+    "posts.tasks.process_post_image": {"queue": "images"},
+    "users.tasks.process_profile_picture": {"queue": "images"},
+}
 CELERY_BEAT_SCHEDULE = {
+    "publish_scheduled_posts": {
+        "task": "posts.tasks.publish_scheduled_posts",
+        "schedule": crontab(),
+    },
     "flush_expired_tokens": {
         "task": "users.tasks.flush_expired_tokens",
-        "schedule": crontab(minute=0, hour=0),
-    }
+        "schedule": crontab(),
+    },
+    "rebuild_token_blacklist_filter": {
+        "task": "users.tasks.rebuild_token_blacklist_filter",
+        "schedule": crontab(minute=45),
+    },
+    "compute_trending_tags": {
+        "task": "posts.tasks.compute_trending_tags",
+        "schedule": crontab(minute="*/5"),
+    },
+    "expire_uploads": {
+        "task": "posts.tasks.expire_uploads",
+        "schedule": crontab(minute=15),
+    },
+    "collect_blobs": {
+        "task": "core.tasks.collect_blobs",
+        "schedule": crontab(minute=0, hour=4),
+    },
+    "reconcile_post_counters": {
+        "task": "posts.tasks.reconcile_post_counters",
+        "schedule": crontab(minute=30, hour=3),
+    },
+    "compute_follow_recommendations": {
+        "task": "users.tasks.compute_follow_recommendations",
+        "schedule": crontab(minute=0, hour=5),
+    },
 }
@@ -0,0 +1,138 @@
+"""
+Asynchronous read views served under ASGI.
+
+DRF views are synchronous, so under an ASGI server every request to them
+holds a thread while it waits on the database or the cache. The views
+built on `AsyncReadView` answer GET requests with the async ORM and cache
+APIs instead, rendering the same serializers as their synchronous
+counterparts. Every other method is handed to the synchronous `fallback`
+view, so writes keep their DRF permissions, validation and signals.
+Reads are throttled like DRF views, with the view's `throttle_scope`.
+Reads go to a replica, as in views with `core.routers.ReplicaReadMixin`.
+
+They are routed in place of the synchronous views when
+`settings.ASYNC_READS` is set, which `config.asgi` does by default.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    Throttled,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from .routers import aread_replica, reset_database, use_database
+
+
+class AsyncReadView(View):
+    """
+    Base view answering GET and HEAD with `async def get()`
+    and any other method with the synchronous `fallback` view
+    """
+
+    fallback = None
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = None
+    renderer_class = JSONRenderer
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # DRF views are exempt as well, they authenticate with tokens
+        view.csrf_exempt = True
+        return view
+
+    def is_async(self, request) -> bool:
+        """Whether the asynchronous `get()` can answer the request"""
+        return request.method in ("GET", "HEAD")
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not self.is_async(request):
+            # Read from the class, so the view function is not bound
+            fallback = type(self).fallback
+
+            if fallback is None:
+                return await self.http_method_not_allowed(request)
+
+            return await sync_to_async(fallback)(request, *args, **kwargs)
+
+        request = Request(request, authenticators=self.get_authenticators())
+
+        try:
+            await sync_to_async(self.initial)(request)
+            token = use_database(await aread_replica(request.user.id))
+
+            try:
+                response = await self.get(request, *args, **kwargs)
+            finally:
+                reset_database(token)
+        except (APIException, Http404) as exc:
+            response = self.handle_exception(request, exc)
+
+        return self.render(request, response)
+
+    def initial(self, request) -> None:
+        """
+        Authenticate and throttle the request,
+        which may block on the database or Redis
+        """
+        request.user
+        self.check_throttles(request)
+
+    def check_throttles(self, request) -> None:
+        waits = [
+            throttle.wait()
+            for throttle in self.get_throttles()
+            if not throttle.allow_request(request, self)
+        ]
+
+        if waits:
+            raise Throttled(max(waits))
+
+    def handle_exception(self, request, exc):
+        """Answer with the error response DRF views would send"""
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            authenticators = request.authenticators
+
+            if authenticators:
+                exc.auth_header = authenticators[0].authenticate_header(
+                    request
+                )
+
+        response = exception_handler(exc, {"request": request, "view": self})
+
+        if response is None:
+            raise exc
+
+        return response
+
+    def get_authenticators(self) -> list:
+        return [auth() for auth in self.authentication_classes]
+
+    def get_throttles(self) -> list:
+        return [throttle() for throttle in self.throttle_classes]
+
+    def render(self, request, response):
+        # Not Modified responses come straight from Django
+        if not isinstance(response, Response):
+            return response
+
+        response.accepted_renderer = self.renderer_class()
+        response.accepted_media_type = self.renderer_class.media_type
+        response.renderer_context = {
+            "request": request,
+            "response": response,
+            "view": self,
+        }
+        return response.render()
+
+    def get_serializer_context(self, request) -> dict:
+        return {"request": request, "view": self}
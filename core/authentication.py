@@ -0,0 +1,163 @@
+"""
+JWT authentication without database queries.
+
+`CachedJWTAuthentication` keeps a compact identity of each active user,
+the user fields and profile fields most views read, in the shared cache
+for `settings.AUTH_CACHE_TIMEOUT` seconds. Identities are stored with the
+token version, the password hash claim of `CHECK_REVOKE_TOKEN`, and only
+serve tokens of that version, so tokens issued before a password change
+are checked against the database and rejected. Saving or deleting a user
+or profile and logging out forget the identity.
+
+Users are rebuilt from identities with the other fields deferred, so they
+load from the database when accessed and saving one writes only the cached
+fields. Views changing the account or the whole profile fetch their
+object from the database instead.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.models import Profile
+
+
+USER_FIELDS = (
+    "id",
+    "email",
+    "username",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+)
+PROFILE_FIELDS = ("id", "user_id", "picture", "picture_variants")
+
+
+def identity_key(user_id) -> str:
+    return f"auth-identity:{user_id}"
+
+
+def forget_identity(user_id) -> None:
+    """Authenticate the next request of a user against the database"""
+    cache.delete(identity_key(user_id))
+
+
+def from_values(model, values: dict):
+    """Build an instance of `model` with only the given fields loaded"""
+    names = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname in values
+    ]
+    return model.from_db(
+        DEFAULT_DB_ALIAS, names, [values[name] for name in names]
+    )
+
+
+def token_version(user) -> str | None:
+    if not api_settings.CHECK_REVOKE_TOKEN:
+        return None
+
+    return get_md5_hash_password(user.password)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Authenticate JWTs with users and their profiles from the cache
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+
+        version = (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+            if api_settings.CHECK_REVOKE_TOKEN
+            else None
+        )
+        identity = cache.get(identity_key(user_id))
+
+        if identity is None or identity["version"] != version:
+            identity = self.load_identity(user_id)
+
+            if identity["version"] != version:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."),
+                    code="password_changed",
+                )
+
+            cache.set(
+                identity_key(user_id), identity, settings.AUTH_CACHE_TIMEOUT
+            )
+
+        return self.build_user(identity)
+
+    def load_identity(self, user_id) -> dict:
+        """Read an active user's identity from the database"""
+        try:
+            user = self.user_model.objects.get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            )
+
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        profile = (
+            Profile.objects.filter(user=user).values(*PROFILE_FIELDS).first()
+        )
+
+        return {
+            "user": {field: getattr(user, field) for field in USER_FIELDS},
+            "profile": profile,
+            "version": token_version(user),
+        }
+
+    def build_user(self, identity: dict):
+        user = from_values(get_user_model(), identity["user"])
+
+        if identity["profile"] is not None:
+            user.profile = from_values(Profile, identity["profile"])
+
+        return user
+
+
+class QueryTokenAuthentication(CachedJWTAuthentication):
+    """
+    Read the access token from the `token` query parameter,
+    for clients such as `EventSource` that cannot set headers
+    """
+
+    query_param = "token"
+
+    def authenticate(self, request):
+        raw_token = request.query_params.get(self.query_param)
+
+        if not raw_token:
+            return None
+
+        validated_token = self.get_validated_token(raw_token.encode())
+        return self.get_user(validated_token), validated_token
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = CachedJWTAuthentication
+    match_subclasses = True
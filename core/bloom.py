@@ -0,0 +1,170 @@
+"""
+Bloom filters on the shared Redis connection.
+
+A filter is a bitmap of `size` bits in which each member sets `hashes`
+bits. A member whose bits are not all set was never added, so most
+lookups of absent members are answered without asking the database,
+while present members and a small fraction of absent ones are reported
+as possibly present and looked up there.
+
+A filter cannot forget members, so it is rebuilt from the source of truth
+into a second bitmap that replaces the live one when complete. Members
+added meanwhile go to both. Until the live bitmap exists, for instance
+after an eviction, every lookup answers `None`, meaning unknown.
+"""
+import hashlib
+import logging
+
+import redis
+
+from .redis import get_redis, local_script
+
+
+logger = logging.getLogger(__name__)
+
+ADD = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    for _, offset in ipairs(ARGV) do
+        redis.call("SETBIT", KEYS[1], offset, 1)
+    end
+end
+if redis.call("EXISTS", KEYS[3]) == 1 then
+    for _, offset in ipairs(ARGV) do
+        redis.call("SETBIT", KEYS[2], offset, 1)
+    end
+end
+return 1
+"""
+
+CONTAINS = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return -1
+end
+for _, offset in ipairs(ARGV) do
+    if redis.call("GETBIT", KEYS[1], offset) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+
+@local_script(ADD)
+def add(data: dict, keys: list, args: list) -> int:
+    """`ADD` for the in-process stand-in"""
+    live, building, marker = keys
+
+    for key in (live, building) if marker in data else (live,):
+        bits = data.get(key)
+
+        if bits is None:
+            continue
+
+        for offset in map(int, args):
+            bits[offset // 8] |= 0x80 >> offset % 8
+
+    return 1
+
+
+@local_script(CONTAINS)
+def contains(data: dict, keys: list, args: list) -> int:
+    """`CONTAINS` for the in-process stand-in"""
+    bits = data.get(keys[0])
+
+    if bits is None:
+        return -1
+
+    return int(
+        all(
+            bits[offset // 8] & 0x80 >> offset % 8
+            for offset in map(int, args)
+        )
+    )
+
+
+class BloomFilter:
+    def __init__(self, name: str, size: int, hashes: int, client=None):
+        self.client = client or get_redis()
+        self.size = size
+        self.hashes = hashes
+        self.live = f"bloom:{name}"
+        self.building = f"bloom:{name}:building"
+        self.marker = f"bloom:{name}:rebuilding"
+        self.add_script = self.client.register_script(ADD)
+        self.contains_script = self.client.register_script(CONTAINS)
+
+    def offsets(self, member: str) -> list[int]:
+        """Bits of a member, from two halves of one hash"""
+        digest = hashlib.blake2b(member.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+
+        return [
+            (first + index * second) % self.size
+            for index in range(self.hashes)
+        ]
+
+    def add(self, member: str) -> None:
+        try:
+            self.add_script(
+                keys=[self.live, self.building, self.marker],
+                args=self.offsets(member),
+            )
+        except redis.RedisError:
+            logger.exception("Adding to the %s filter failed", self.live)
+
+            # The member must not be reported absent
+            try:
+                self.clear()
+            except redis.RedisError:
+                pass
+
+    def contains(self, member: str) -> bool | None:
+        """
+        Return False if the member was never added, True if it may have
+        been and None if the filter is unavailable
+        """
+        try:
+            found = self.contains_script(
+                keys=[self.live], args=self.offsets(member)
+            )
+        except redis.RedisError:
+            logger.exception("Reading the %s filter failed", self.live)
+            return None
+
+        return None if found == -1 else bool(found)
+
+    def rebuild(self, members, batch_size: int = 10_000) -> int:
+        """
+        Replace the filter with one holding `members`, an iterable
+        evaluated after members added meanwhile start going to both
+        """
+        client = self.client
+        client.delete(self.building)
+        # Allocated in full, so the bitmap exists even without members
+        client.setbit(self.building, self.size - 1, 0)
+        client.set(self.marker, 1)
+
+        count = 0
+        pipeline = client.pipeline(transaction=False)
+
+        for member in members:
+            for offset in self.offsets(member):
+                pipeline.setbit(self.building, offset, 1)
+
+            count += 1
+
+            if count % batch_size == 0:
+                pipeline.execute()
+
+        pipeline.execute()
+
+        pipeline = client.pipeline()
+        pipeline.rename(self.building, self.live)
+        pipeline.delete(self.marker)
+        pipeline.execute()
+        return count
+
+    def clear(self) -> None:
+        """Drop the filter, so lookups are unknown until it is rebuilt"""
+        self.client.delete(self.live)
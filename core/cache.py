@@ -0,0 +1,236 @@
+"""
+Versioned response cache and conditional requests.
+
+Responses are keyed by the versions of the objects they render. Writes
+replace those versions instead of deleting keys, so every response built
+from an outdated version is skipped at once and expires on its own.
+
+A version is an opaque token starting with the time it was issued, which
+makes the versions of a response double as its ETag and Last-Modified
+validators without reading the database or serializing anything.
+"""
+import hashlib
+import secrets
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from prometheus_client import Counter
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import primary_reads
+
+
+CACHE_REQUESTS = Counter(
+    "api_response_cache_requests",
+    "Response cache lookups by namespace and result",
+    ("namespace", "result"),
+)
+NOT_MODIFIED_RESPONSES = Counter(
+    "api_not_modified_responses",
+    "Conditional requests answered with 304 Not Modified by namespace",
+    ("namespace",),
+)
+
+
+def version_key(*parts) -> str:
+    return "version:" + ":".join(map(str, parts))
+
+
+def new_version() -> str:
+    return f"{time.time_ns()}-{secrets.token_hex(4)}"
+
+
+def get_versions(*names) -> list[str]:
+    """Return the current version of each name, a tuple of key parts"""
+    keys = [version_key(*name) for name in names]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), timeout=None)
+            versions[key] = cache.get(key)
+
+    return [str(versions[key]) for key in keys]
+
+
+async def aget_versions(*names) -> list[str]:
+    """Asynchronous version of `get_versions`"""
+    keys = [version_key(*name) for name in names]
+    versions = await cache.aget_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, new_version(), timeout=None)
+            versions[key] = await cache.aget(key)
+
+    return [str(versions[key]) for key in keys]
+
+
+def bump_version(*parts) -> None:
+    cache.set(version_key(*parts), new_version(), timeout=None)
+
+
+def bump_versions(names) -> None:
+    """Replace the versions of many names in a single round trip"""
+    version = new_version()
+    cache.set_many(
+        {version_key(*name): version for name in names},
+        timeout=None,
+    )
+
+
+class Validators:
+    """
+    Weak ETag and last modification time of a response rendered from the
+    given versions. `extra` distinguishes responses built from the same
+    versions, such as pages of one list or views of different users.
+    """
+
+    def __init__(self, versions, extra=""):
+        self.versions = versions
+        digest = hashlib.md5(
+            "|".join((*self.versions, str(extra))).encode()
+        ).hexdigest()
+        self.etag = f'W/"{digest}"'
+        self.issued_at = max(
+            int(version.split("-")[0]) for version in self.versions
+        ) / 1_000_000_000
+        self.last_modified = int(self.issued_at)
+
+    def build_context(self):
+        """
+        Read from the primary while replicas may lag behind the versions,
+        so a stale response is never stored or validated under them
+        """
+        if time.time() - self.issued_at < settings.REPLICA_PIN_WINDOW:
+            return primary_reads()
+
+        return nullcontext()
+
+    def set_headers(self, response) -> None:
+        if response.status_code not in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            return
+
+        response.headers["ETag"] = self.etag
+        response.headers["Last-Modified"] = http_date(self.last_modified)
+
+    def not_modified(self, request, namespace: str):
+        """Return a 304 response if the client's validators match"""
+        # Versions exist whether or not the object does,
+        # so they cannot answer `If-None-Match: *`
+        if request.headers.get("If-None-Match", "").strip() == "*":
+            return None
+
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+
+        if response is not None:
+            NOT_MODIFIED_RESPONSES.labels(namespace).inc()
+
+        return response
+
+
+def response_key(namespace: str, versions, url: str) -> str:
+    return "response:{}:{}:{}".format(
+        namespace,
+        ".".join(versions),
+        hashlib.md5(url.encode()).hexdigest(),
+    )
+
+
+def conditional_response(request, namespace: str, names, build, extra=""):
+    """
+    Answer a GET with 304 Not Modified when the client's validators match
+    the current versions, otherwise return `build()` with validators set
+    """
+    validators = Validators(get_versions(*names), extra)
+    response = validators.not_modified(request, namespace)
+
+    if response is None:
+        with validators.build_context():
+            response = build()
+
+    validators.set_headers(response)
+
+    return response
+
+
+def cached_response(request, namespace: str, names, build) -> Response:
+    """
+    Like `conditional_response`, but also keep a copy of the response
+    data for the current versions and the request's URL
+    """
+    url = request.build_absolute_uri()
+
+    def build_cached():
+        key = response_key(namespace, get_versions(*names), url)
+        data = cache.get(key)
+
+        if data is not None:
+            CACHE_REQUESTS.labels(namespace, "hit").inc()
+            return Response(data)
+
+        CACHE_REQUESTS.labels(namespace, "miss").inc()
+        response = build()
+
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+
+        return response
+
+    return conditional_response(request, namespace, names, build_cached, url)
+
+
+async def aconditional_response(
+    request, namespace: str, names, build, extra=""
+):
+    """Asynchronous version of `conditional_response`, awaiting `build()`"""
+    validators = Validators(await aget_versions(*names), extra)
+    response = validators.not_modified(request, namespace)
+
+    if response is None:
+        with validators.build_context():
+            response = await build()
+
+    validators.set_headers(response)
+
+    return response
+
+
+async def acached_response(request, namespace: str, names, build) -> Response:
+    """
+    Asynchronous version of `cached_response`,
+    sharing its cached copies with the synchronous views
+    """
+    url = request.build_absolute_uri()
+
+    async def build_cached():
+        key = response_key(namespace, await aget_versions(*names), url)
+        data = await cache.aget(key)
+
+        if data is not None:
+            CACHE_REQUESTS.labels(namespace, "hit").inc()
+            return Response(data)
+
+        CACHE_REQUESTS.labels(namespace, "miss").inc()
+        response = await build()
+
+        if response.status_code == status.HTTP_200_OK:
+            await cache.aset(
+                key, response.data, settings.RESPONSE_CACHE_TIMEOUT
+            )
+
+        return response
+
+    return await aconditional_response(
+        request, namespace, names, build_cached, url
+    )
@@ -0,0 +1,89 @@
+"""
+Conditional writes of many-to-many edges.
+
+Each helper is a single statement whose `RETURNING` clause reports which
+edges actually changed, so callers can keep counters exact without
+reading the edges first. `ON CONFLICT DO NOTHING` relies on the unique
+constraint Django creates on every many-to-many table.
+"""
+from django.db import connection
+
+
+def _table(through) -> str:
+    return connection.ops.quote_name(through._meta.db_table)
+
+
+def _column(through, field: str) -> str:
+    return connection.ops.quote_name(through._meta.get_field(field).column)
+
+
+def _fetch_ids(sql: str, params: list) -> list[int]:
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add_edges(
+    through,
+    source: str,
+    source_id: int,
+    target: str,
+    target_ids,
+    **values,
+) -> list[int]:
+    """
+    Insert the edges from `source_id` to each of `target_ids` that do not
+    exist yet, returning the ids of the targets that were linked.
+    `values` sets the other fields of the inserted rows.
+    """
+    target_ids = list(dict.fromkeys(target_ids))
+
+    if not target_ids:
+        return []
+
+    columns = [_column(through, field) for field in (source, target)]
+    columns += [_column(through, field) for field in values]
+    row = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    # Adapted as the ORM would, e.g. datetimes to SQLite's format
+    values = [
+        through._meta.get_field(field).get_db_prep_save(value, connection)
+        for field, value in values.items()
+    ]
+    params = [
+        param
+        for target_id in target_ids
+        for param in (source_id, target_id, *values)
+    ]
+
+    return _fetch_ids(
+        f"INSERT INTO {_table(through)} ({', '.join(columns)}) "
+        f"VALUES {', '.join([row] * len(target_ids))} "
+        f"ON CONFLICT DO NOTHING RETURNING {_column(through, target)}",
+        params,
+    )
+
+
+def remove_edges(
+    through,
+    source: str,
+    source_id: int,
+    target: str,
+    target_ids,
+) -> list[int]:
+    """
+    Delete the edges from `source_id` to each of `target_ids`,
+    returning the ids of the targets that were linked
+    """
+    target_ids = list(dict.fromkeys(target_ids))
+
+    if not target_ids:
+        return []
+
+    return _fetch_ids(
+        f"DELETE FROM {_table(through)} "
+        f"WHERE {_column(through, source)} = %s "
+        f"AND {_column(through, target)} IN "
+        f"({', '.join(['%s'] * len(target_ids))}) "
+        f"RETURNING {_column(through, target)}",
+        [source_id, *target_ids],
+    )
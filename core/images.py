@@ -0,0 +1,115 @@
+"""
+Resized variants of uploaded images.
+
+Every size in `settings.IMAGE_VARIANTS` is rendered in each format of
+`settings.IMAGE_VARIANT_FORMATS` and stored next to the original. Variants
+are re-encoded from the decoded pixels, so EXIF metadata such as the GPS
+position is dropped after its orientation has been applied.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+FORMATS = {
+    "webp": "WEBP",
+    "jpeg": "JPEG",
+}
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Return an RGB copy, laying transparent pixels over white"""
+    if image.mode == "RGB":
+        return image
+
+    image = image.convert("RGBA")
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def _encode(image: Image.Image, extension: str, icc_profile) -> bytes:
+    if extension == "jpeg":
+        image = _flatten(image)
+
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        FORMATS[extension],
+        quality=settings.IMAGE_VARIANT_QUALITY,
+        optimize=extension == "jpeg",
+        progressive=extension == "jpeg",
+        icc_profile=icc_profile,
+    )
+    return buffer.getvalue()
+
+
+def render_variants(file, name: str) -> dict:
+    """
+    Render and store the variants of an image file, returning their
+    storage names and dimensions by size, e.g.
+    `{"feed": {"width": 640, "height": 480, "webp": ..., "jpeg": ...}}`
+    """
+    directory, filename = os.path.split(name)
+    stem, _ = os.path.splitext(filename)
+
+    with Image.open(file) as source:
+        icc_profile = source.info.get("icc_profile")
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if _has_alpha(image) else "RGB")
+
+    variants = {}
+
+    for size, max_dimension in settings.IMAGE_VARIANTS.items():
+        resized = image.copy()
+        # Never upscales, so small originals keep their dimensions
+        resized.thumbnail(
+            (max_dimension, max_dimension), Image.Resampling.LANCZOS
+        )
+        variant = {"width": resized.width, "height": resized.height}
+
+        for extension in settings.IMAGE_VARIANT_FORMATS:
+            variant[extension] = default_storage.save(
+                os.path.join(
+                    directory, "variants", f"{stem}-{size}.{extension}"
+                ),
+                ContentFile(_encode(resized, extension, icc_profile)),
+            )
+
+        variants[size] = variant
+
+    return variants
+
+
+def delete_variants(variants: dict) -> None:
+    for variant in variants.values():
+        for extension in FORMATS:
+            if variant.get(extension):
+                default_storage.delete(variant[extension])
+
+
+def variant_urls(variants: dict, request=None) -> dict:
+    """Replace the storage names of variants with their URLs"""
+    urls = {}
+
+    for size, variant in variants.items():
+        urls[size] = dict(variant)
+
+        for extension in FORMATS:
+            if variant.get(extension):
+                url = default_storage.url(variant[extension])
+                urls[size][extension] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+
+    return urls
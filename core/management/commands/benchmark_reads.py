@@ -0,0 +1,199 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts.models import Post
+from users.models import Profile
+
+
+PATHS = (
+    "/api/posts/",
+    "/api/posts/{post}/",
+    "/api/posts/home/",
+    "/api/users/profiles/{profile}/",
+)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Command(BaseCommand):
+    """
+    Django command to load the hot read endpoints of running servers
+    one after another and report requests per second and latency for each.
+
+    Compare the WSGI and ASGI deployments given the same memory, e.g.:
+        docker-compose --profile benchmark up -d web-wsgi web-asgi
+        docker-compose run --rm web python manage.py benchmark_reads \\
+            http://web-wsgi:8000 http://web-asgi:8000
+
+    Targets must run with `DISABLE_THROTTLING`, as the benchmark services
+    do, since every request is sent as one user. Responses other than 2xx
+    are counted apart from failed requests, and a target answering mostly
+    with them fails the run.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="+", metavar="URL")
+        parser.add_argument("--paths", nargs="+", default=PATHS)
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=30)
+        parser.add_argument("--warmup", type=float, default=5)
+        parser.add_argument(
+            "--email",
+            help="User to authenticate as, the first user by default",
+        )
+
+    def handle(self, *args, **kwargs):
+        paths = self.resolve_paths(kwargs["paths"])
+        headers = {"Authorization": f"Bearer {self.token(kwargs['email'])}"}
+        self.stdout.write(
+            f"{'target':<28} {'path':<28} {'requests':>9} {'non-2xx':>8} "
+            f"{'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+
+        for target in kwargs["targets"]:
+            self.load(
+                target, paths, headers, kwargs["concurrency"], kwargs["warmup"]
+            )
+            timings, statuses, errors = self.load(
+                target,
+                paths,
+                headers,
+                kwargs["concurrency"],
+                kwargs["duration"],
+            )
+
+            for path in (*paths, None):
+                path_timings = (
+                    timings[path]
+                    if path
+                    else [t for values in timings.values() for t in values]
+                )
+                path_statuses = (
+                    statuses[path]
+                    if path
+                    else sum(statuses.values(), Counter())
+                )
+                path_errors = errors[path] if path else sum(errors.values())
+                self.stdout.write(
+                    f"{target:<28} {path or 'all':<28} "
+                    f"{len(path_timings):>9} {path_statuses.total():>8} "
+                    f"{path_errors:>7} "
+                    f"{len(path_timings) / kwargs['duration']:>8.1f} "
+                    f"{percentile(path_timings, 0.5):>8.2f} "
+                    f"{percentile(path_timings, 0.99):>8.2f}"
+                )
+
+            self.check_failures(target, timings, statuses, errors)
+
+    @staticmethod
+    def check_failures(target: str, timings, statuses, errors) -> None:
+        """Fail when most requests were not answered with 2xx"""
+        succeeded = sum(len(values) for values in timings.values())
+        rejected = sum(statuses.values(), Counter())
+        failed = rejected.total() + sum(errors.values())
+
+        if failed > succeeded:
+            responses = ", ".join(
+                f"{count} x {status}"
+                for status, count in rejected.most_common()
+            )
+            raise CommandError(
+                f"{target} failed {failed} of {failed + succeeded} requests"
+                + (f", answering {responses}" if responses else "")
+            )
+
+    @staticmethod
+    def resolve_paths(paths) -> list[str]:
+        post_id = (
+            Post.objects.filter(published=True)
+            .values_list("id", flat=True)
+            .first()
+        )
+        profile_id = Profile.objects.values_list("id", flat=True).first()
+
+        if post_id is None or profile_id is None:
+            raise CommandError("Create a post and a profile to load first")
+
+        return [
+            path.format(post=post_id, profile=profile_id) for path in paths
+        ]
+
+    @staticmethod
+    def token(email: str | None) -> str:
+        users = get_user_model().objects.order_by("id")
+        user = users.filter(email=email).first() if email else users.first()
+
+        if user is None:
+            raise CommandError("User not found")
+
+        return str(AccessToken.for_user(user))
+
+    @staticmethod
+    def load(target: str, paths, headers, concurrency: int, duration: float):
+        """
+        Send GET requests for `paths` in turn from `concurrency` keep-alive
+        connections for `duration` seconds, returning the latencies in
+        milliseconds of 2xx responses, the statuses of other responses
+        and the number of failed requests
+        """
+        url = urlsplit(target)
+        deadline = time.perf_counter() + duration
+
+        def worker(offset: int):
+            connection = HTTPConnection(url.hostname, url.port or 80)
+            timings = {path: [] for path in paths}
+            statuses = {path: Counter() for path in paths}
+            errors = Counter()
+            sent = offset
+
+            while time.perf_counter() < deadline:
+                path = paths[sent % len(paths)]
+                sent += 1
+                started = time.perf_counter()
+
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, HTTPException):
+                    connection.close()
+                    errors[path] += 1
+                    continue
+
+                if not 200 <= response.status < 300:
+                    statuses[path][response.status] += 1
+                    continue
+
+                timings[path].append((time.perf_counter() - started) * 1000)
+
+            connection.close()
+            return timings, statuses, errors
+
+        timings = {path: [] for path in paths}
+        statuses = {path: Counter() for path in paths}
+        errors = Counter()
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            for worker_timings, worker_statuses, worker_errors in (
+                executor.map(worker, range(concurrency))
+            ):
+                for path in paths:
+                    timings[path].extend(worker_timings[path])
+                    statuses[path].update(worker_statuses[path])
+
+                errors.update(worker_errors)
+
+        return timings, statuses, errors
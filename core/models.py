@@ -0,0 +1,36 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Blob(models.Model):
+    """
+    A file in the content-addressed storage with the number of model
+    fields referencing it. Unreferenced blobs are removed by
+    `collect_blobs` once `settings.BLOB_GC_GRACE` has passed.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=("updated_at",),
+                name="blob_unreferenced_idx",
+                condition=models.Q(ref_count=0),
+            ),
+        )
+
+    def __str__(self) -> str:
+        return self.name
+
+    @classmethod
+    def release(cls, name: str) -> None:
+        """Drop one reference to a blob"""
+        cls.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=models.F("ref_count") - 1,
+            updated_at=timezone.now(),
+        )
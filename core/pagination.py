@@ -1,7 +1,218 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class StandardResultSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the `(created_at, id)` key, newest first.
+
+    `until` returns the items older than a cursor and `since` the items
+    newer than it, so every page is an index range read regardless of how
+    deep the client has scrolled. The `next` link continues to older items
+    and the `previous` link polls for items newer than the current page.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    since_query_param = "since"
+    until_query_param = "until"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(key: tuple) -> str:
+        created_at, pk = key
+        value = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, request, param: str):
+        encoded = request.query_params.get(param)
+
+        if not encoded:
+            return None
+
+        try:
+            value = base64.urlsafe_b64decode(encoded.encode()).decode()
+            created_at, pk = value.split("|")
+            created_at, pk = parse_datetime(created_at), int(pk)
+        except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(created_at, datetime):
+            raise NotFound(self.invalid_cursor_message)
+
+        return created_at, pk
+
+    @staticmethod
+    def get_key(item) -> tuple:
+        return item.created_at, item.pk
+
+    def filter_queryset(self, queryset, since=None, until=None):
+        if since:
+            created_at, pk = since
+            return queryset.filter(
+                Q(created_at__gt=created_at)
+                | Q(created_at=created_at, pk__gt=pk)
+            ).order_by("created_at", "pk")
+
+        if until:
+            created_at, pk = until
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at)
+                | Q(created_at=created_at, pk__lt=pk)
+            )
+
+        return queryset.order_by("-created_at", "-pk")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        def fetch(limit, since, until):
+            return list(self.filter_queryset(queryset, since, until)[:limit])
+
+        return self.paginate_fetch(fetch, request)
+
+    def paginate_fetch(self, fetch, request) -> list:
+        """
+        Paginate any source ordered on the `(created_at, id)` key.
+        `fetch(limit, since, until)` must return the items right after
+        `since` in ascending order, or the items before `until`
+        (or the newest items) in descending order.
+        """
+        self.read_params(request)
+        return self.set_page(fetch(self.limit + 1, self.since, self.until))
+
+    async def apaginate_queryset(self, queryset, request) -> list:
+        async def fetch(limit, since, until):
+            page = self.filter_queryset(queryset, since, until)[:limit]
+            return [item async for item in page]
+
+        return await self.apaginate_fetch(fetch, request)
+
+    async def apaginate_fetch(self, fetch, request) -> list:
+        """Like `paginate_fetch`, awaiting an asynchronous `fetch`"""
+        self.read_params(request)
+        return self.set_page(
+            await fetch(self.limit + 1, self.since, self.until)
+        )
+
+    def read_params(self, request) -> None:
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.since = self.decode_cursor(request, self.since_query_param)
+        self.until = self.decode_cursor(request, self.until_query_param)
+
+    def set_page(self, items) -> list:
+        items = list(items)
+        self.has_more = len(items) > self.limit
+        items = items[: self.limit]
+
+        if self.since:
+            items.reverse()
+
+        self.page = items
+        return items
+
+    def get_next_link(self):
+        if not self.page:
+            return None
+
+        # Pages fetched after a `since` cursor always have older items
+        if not (self.has_more or self.since):
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.since_query_param)
+        return replace_query_param(
+            url,
+            self.until_query_param,
+            self.encode_cursor(self.get_key(self.page[-1])),
+        )
+
+    def get_previous_link(self):
+        if not self.page and not self.since:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.until_query_param)
+        cursor = (
+            self.encode_cursor(self.get_key(self.page[0]))
+            if self.page
+            else self.request.query_params[self.since_query_param]
+        )
+        return replace_query_param(url, self.since_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {
+                    "type": "string",
+                    "nullable": True,
+                    "format": "uri",
+                },
+                "previous": {
+                    "type": "string",
+                    "nullable": True,
+                    "format": "uri",
+                },
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.since_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Return items newer than this cursor",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.until_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Return items older than this cursor",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page",
+                "schema": {"type": "integer"},
+            },
+        ]
@@ -0,0 +1,110 @@
+"""
+In-process fan-out of Redis pub/sub messages.
+
+Each event loop keeps a single pub/sub connection, shared by all of its
+subscribers, and subscribes it to a channel while at least one local
+subscriber listens to the channel. Messages are handed to subscribers
+through bounded queues, so an idle subscriber costs a queue and no thread,
+and a slow one misses messages instead of holding them in memory.
+"""
+import asyncio
+import logging
+import weakref
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+
+from .redis import get_async_redis, get_redis
+
+
+logger = logging.getLogger(__name__)
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+class Hub:
+    def __init__(self, client):
+        self.client = client
+        self.pubsub = None
+        self.listener = None
+        self.queues = defaultdict(set)
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=settings.PUBSUB_QUEUE_SIZE)
+
+        async with self.lock:
+            if self.pubsub is None:
+                self.pubsub = self.client.pubsub()
+
+            if channel not in self.queues:
+                await self.pubsub.subscribe(channel)
+
+            self.queues[channel].add(queue)
+
+            if self.listener is None:
+                self.listener = asyncio.create_task(self.listen())
+
+        return queue
+
+    async def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        async with self.lock:
+            queues = self.queues.get(channel)
+
+            if queues is None:
+                return
+
+            queues.discard(queue)
+
+            if not queues:
+                del self.queues[channel]
+                await self.pubsub.unsubscribe(channel)
+
+    async def listen(self) -> None:
+        while True:
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except redis.RedisError:
+                # The connection resubscribes when it reconnects
+                logger.exception("Pub/sub connection failed")
+                await asyncio.sleep(1)
+                continue
+
+            if message is None or message["type"] != "message":
+                continue
+
+            for queue in tuple(self.queues.get(message["channel"], ())):
+                try:
+                    queue.put_nowait(message["data"])
+                except asyncio.QueueFull:
+                    pass
+
+
+def get_hub() -> Hub:
+    """Return the hub of the running event loop"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+
+    if hub is None:
+        hub = _hubs[loop] = Hub(get_async_redis())
+
+    return hub
+
+
+def publish_many(messages) -> None:
+    """
+    Publish `(channel, message)` pairs in a single round trip.
+    Delivery is best effort, so a failure is logged and ignored.
+    """
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+
+        for channel, message in messages:
+            pipeline.publish(channel, message)
+
+        pipeline.execute()
+    except redis.RedisError:
+        logger.exception("Publishing failed")
@@ -0,0 +1,397 @@
+"""
+Shared Redis connection.
+
+`REDIS_URL` selects the server. When it is unset or uses the `local://`
+scheme, an in-process stand-in implementing the subset of commands the
+project relies on is returned instead, so tests and single-process
+deployments run without a Redis server.
+"""
+import asyncio
+import bisect
+import functools
+import threading
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+
+LOCAL_SCHEME = "local://"
+
+# Lua script source -> function running it on `LocalRedis` data
+_local_scripts = {}
+
+
+def local_script(script: str):
+    """
+    Register the decorated function as the implementation of a Lua script
+    for `LocalRedis`, called with its data dict, keys and arguments
+    """
+
+    def register(function):
+        _local_scripts[script] = function
+        return function
+
+    return register
+
+
+def _parse_bound(bound):
+    """Parse a sorted set score bound such as `5`, `(5`, `-inf` or `+inf`"""
+    if isinstance(bound, str):
+        if bound in ("-inf", "+inf", "inf"):
+            return float(bound), False
+
+        if bound.startswith("("):
+            return float(bound[1:]), True
+
+    return float(bound), False
+
+
+def _in_range(score, low, high) -> bool:
+    (low_value, low_exclusive), (high_value, high_exclusive) = low, high
+
+    if score < low_value or (low_exclusive and score == low_value):
+        return False
+
+    if score > high_value or (high_exclusive and score == high_value):
+        return False
+
+    return True
+
+
+class LocalRedis:
+    """
+    In-process stand-in for a Redis client.
+    Values are stored as strings, like a client
+    created with `decode_responses=True`.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = {}
+        self._subscribers = {}
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            return sum(
+                self._data.pop(key, None) is not None for key in keys
+            )
+
+    def exists(self, *keys) -> int:
+        with self._lock:
+            return sum(key in self._data for key in keys)
+
+    def set(self, key, value) -> bool:
+        with self._lock:
+            self._data[key] = str(value)
+            return True
+
+    def rename(self, src, dst) -> bool:
+        with self._lock:
+            if src not in self._data:
+                raise redis.ResponseError("no such key")
+
+            self._data[dst] = self._data.pop(src)
+            return True
+
+    # Bitmaps are kept as bytearrays, bit 0 being the highest bit
+    # of the first byte as in Redis.
+
+    def setbit(self, key, offset, value) -> int:
+        with self._lock:
+            bits = self._data.setdefault(key, bytearray())
+            index, mask = offset // 8, 0x80 >> offset % 8
+
+            if index >= len(bits):
+                bits.extend(bytes(index + 1 - len(bits)))
+
+            previous = int(bool(bits[index] & mask))
+            bits[index] = bits[index] | mask if value else bits[index] & ~mask
+            return previous
+
+    def getbit(self, key, offset) -> int:
+        with self._lock:
+            bits = self._data.get(key, b"")
+            index = offset // 8
+
+            if index >= len(bits):
+                return 0
+
+            return int(bool(bits[index] & 0x80 >> offset % 8))
+
+    def publish(self, channel, message) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for pubsub in subscribers:
+            pubsub._deliver(channel, str(message))
+
+        return len(subscribers)
+
+    def pubsub(self, **kwargs):
+        return LocalPubSub(self)
+
+    def register_script(self, script: str):
+        function = _local_scripts[script]
+
+        def run(keys=(), args=(), client=None):
+            with self._lock:
+                return function(self._data, list(keys), list(args))
+
+        return run
+
+    # Sorted sets are kept as a member -> score dict plus a list
+    # of (score, member) pairs sorted ascending.
+
+    def _zset(self, key, create=False):
+        zset = self._data.get(key)
+
+        if zset is None and create:
+            zset = self._data[key] = ({}, [])
+
+        return zset
+
+    def zadd(self, key, mapping) -> int:
+        with self._lock:
+            scores, ordered = self._zset(key, create=True)
+            added = 0
+
+            for member, score in mapping.items():
+                member, score = str(member), float(score)
+                current = scores.get(member)
+
+                if current is not None:
+                    ordered.remove((current, member))
+                else:
+                    added += 1
+
+                scores[member] = score
+                bisect.insort(ordered, (score, member))
+
+            return added
+
+    def zrem(self, key, *members) -> int:
+        with self._lock:
+            zset = self._zset(key)
+
+            if zset is None:
+                return 0
+
+            scores, ordered = zset
+            removed = 0
+
+            for member in map(str, members):
+                score = scores.pop(member, None)
+
+                if score is not None:
+                    ordered.remove((score, member))
+                    removed += 1
+
+            if not scores:
+                del self._data[key]
+
+            return removed
+
+    def zcard(self, key) -> int:
+        with self._lock:
+            zset = self._zset(key)
+            return len(zset[0]) if zset else 0
+
+    def zscore(self, key, member):
+        with self._lock:
+            zset = self._zset(key)
+            return zset[0].get(str(member)) if zset else None
+
+    def _slice(self, items, start, num):
+        if start is None:
+            return items
+
+        return items[start:] if num is None or num < 0 else (
+            items[start:start + num]
+        )
+
+    def zrange(self, key, start, end, desc=False, withscores=False):
+        with self._lock:
+            zset = self._zset(key)
+            ordered = list(zset[1]) if zset else []
+
+        if desc:
+            ordered.reverse()
+
+        size = len(ordered)
+        start = start + size if start < 0 else start
+        end = end + size if end < 0 else end
+        items = ordered[max(start, 0):end + 1]
+
+        return self._format(items, withscores)
+
+    def zrevrange(self, key, start, end, withscores=False):
+        return self.zrange(key, start, end, desc=True, withscores=withscores)
+
+    def zrangebyscore(
+        self, key, min, max, start=None, num=None, withscores=False
+    ):
+        low, high = _parse_bound(min), _parse_bound(max)
+
+        with self._lock:
+            zset = self._zset(key)
+            ordered = list(zset[1]) if zset else []
+
+        items = [item for item in ordered if _in_range(item[0], low, high)]
+
+        return self._format(self._slice(items, start, num), withscores)
+
+    def zrevrangebyscore(
+        self, key, max, min, start=None, num=None, withscores=False
+    ):
+        low, high = _parse_bound(min), _parse_bound(max)
+
+        with self._lock:
+            zset = self._zset(key)
+            ordered = list(zset[1]) if zset else []
+
+        items = [
+            item
+            for item in reversed(ordered)
+            if _in_range(item[0], low, high)
+        ]
+
+        return self._format(self._slice(items, start, num), withscores)
+
+    def zremrangebyrank(self, key, start, end) -> int:
+        with self._lock:
+            zset = self._zset(key)
+
+            if zset is None:
+                return 0
+
+            scores, ordered = zset
+            size = len(ordered)
+            start = start + size if start < 0 else start
+            end = end + size if end < 0 else end
+            doomed = ordered[max(start, 0):end + 1]
+
+            for score, member in doomed:
+                del scores[member]
+                ordered.remove((score, member))
+
+            if not scores:
+                del self._data[key]
+
+            return len(doomed)
+
+    @staticmethod
+    def _format(items, withscores):
+        if withscores:
+            return [(member, score) for score, member in items]
+
+        return [member for _, member in items]
+
+
+class LocalPipeline:
+    """
+    Buffer commands and run them under the client lock on `execute()`
+    """
+
+    def __init__(self, client: LocalRedis):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands.clear()
+
+    def execute(self):
+        with self._client._lock:
+            results = [
+                method(*args, **kwargs)
+                for method, args, kwargs in self._commands
+            ]
+
+        self._commands.clear()
+        return results
+
+
+class LocalPubSub:
+    """
+    Stand-in for a `redis.asyncio` pub/sub connection of `LocalRedis`,
+    receiving messages published from any thread on its event loop
+    """
+
+    def __init__(self, client: LocalRedis):
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+        self._messages = asyncio.Queue()
+
+    async def subscribe(self, *channels) -> None:
+        with self._client._lock:
+            for channel in channels:
+                self._client._subscribers.setdefault(channel, set()).add(self)
+
+    async def unsubscribe(self, *channels) -> None:
+        with self._client._lock:
+            for channel in channels:
+                subscribers = self._client._subscribers.get(channel, set())
+                subscribers.discard(self)
+
+                if not subscribers:
+                    self._client._subscribers.pop(channel, None)
+
+    def _deliver(self, channel, message: str) -> None:
+        message = {"type": "message", "channel": channel, "data": message}
+
+        try:
+            self._loop.call_soon_threadsafe(
+                self._messages.put_nowait, message
+            )
+        except RuntimeError:
+            # The event loop is closed
+            pass
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self._messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_redis():
+    """Return the process-wide Redis client"""
+    url = getattr(settings, "REDIS_URL", None)
+
+    if not url or url.startswith(LOCAL_SCHEME):
+        return LocalRedis()
+
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def get_async_redis():
+    """
+    Return a new `redis.asyncio` client for the running event loop,
+    or the process-wide stand-in, which supports pub/sub only
+    """
+    url = getattr(settings, "REDIS_URL", None)
+
+    if not url or url.startswith(LOCAL_SCHEME):
+        return get_redis()
+
+    return redis.asyncio.Redis.from_url(url, decode_responses=True)
@@ -0,0 +1,164 @@
+"""
+Read replicas with read-your-writes.
+
+Queries go to the primary unless a request opted into replica reads with
+`ReplicaReadMixin` or an async read view. Such a request picks one of
+`settings.REPLICA_DATABASES` for all of its reads, unless its user wrote
+within `settings.REPLICA_PIN_WINDOW` seconds: `PrimaryPinMiddleware` pins
+users to the primary for the window after any successful write, so they
+always read what they just wrote.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+
+_read_database = ContextVar("read_database", default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Also for objects read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas receive the schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+def pin_key(user_id: int) -> str:
+    return f"primary-pin:{user_id}"
+
+
+def pin_to_primary(user_id: int) -> None:
+    cache.set(pin_key(user_id), 1, settings.REPLICA_PIN_WINDOW)
+
+
+async def apin_to_primary(user_id: int) -> None:
+    """Asynchronous version of `pin_to_primary`"""
+    await cache.aset(pin_key(user_id), 1, settings.REPLICA_PIN_WINDOW)
+
+
+def choose_replica(pinned: bool) -> str | None:
+    if pinned or not settings.REPLICA_DATABASES:
+        return None
+
+    return random.choice(settings.REPLICA_DATABASES)
+
+
+def read_replica(user_id: int | None) -> str | None:
+    """Return the replica a user's reads may use, if any"""
+    return choose_replica(
+        user_id is not None and cache.get(pin_key(user_id)) is not None
+    )
+
+
+async def aread_replica(user_id: int | None) -> str | None:
+    """Asynchronous version of `read_replica`"""
+    return choose_replica(
+        user_id is not None and await cache.aget(pin_key(user_id)) is not None
+    )
+
+
+def use_database(alias: str | None):
+    """Route reads to `alias`, or the primary, until the token is reset"""
+    return _read_database.set(alias)
+
+
+def reset_database(token) -> None:
+    _read_database.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    token = use_database(None)
+
+    try:
+        yield
+    finally:
+        reset_database(token)
+
+
+def wrote(request, response):
+    """Return the id of the user who successfully wrote, if any"""
+    user = getattr(request, "user", None)
+
+    if (
+        request.method in SAFE_METHODS
+        or response.status_code >= 400
+        or user is None
+        or not user.is_authenticated
+    ):
+        return None
+
+    return user.id
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin users to the primary after their successful writes to any view.
+    DRF views set the user they authenticated on the Django request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+
+        if (user_id := wrote(request, response)) is not None:
+            pin_to_primary(user_id)
+
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+
+        if (user_id := wrote(request, response)) is not None:
+            await apin_to_primary(user_id)
+
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Serve the reads of safe-method requests from a replica
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        # Authenticated by now, on the primary
+        if request.method in SAFE_METHODS:
+            self.database_token = use_database(read_replica(request.user.id))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "database_token", None)
+
+        if token is not None:
+            reset_database(token)
+            self.database_token = None
+
+        return super().finalize_response(request, response, *args, **kwargs)
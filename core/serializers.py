@@ -1,5 +1,99 @@
+from django.core.files.storage import default_storage
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from core.images import variant_urls
+
 
 class EmptySerializer(serializers.Serializer):
     pass
+
+
+class IdListField(serializers.ListField):
+    """
+    List of integer ids, also accepted as comma-separated strings
+    such as the `?ids=1,2,3` query parameter
+    """
+
+    child = serializers.IntegerField()
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [data]
+
+        if isinstance(data, list):
+            data = [
+                part
+                for item in data
+                for part in (
+                    item.split(",") if isinstance(item, str) else (item,)
+                )
+                if not isinstance(part, str) or part.strip()
+            ]
+
+        return list(dict.fromkeys(super().to_internal_value(data)))
+
+
+class IdsQuerySerializer(serializers.Serializer):
+    max_ids = 100
+
+    ids = IdListField(max_length=max_ids)
+
+
+@extend_schema_field(OpenApiTypes.URI)
+class ImageVariantField(serializers.Field):
+    """
+    URL of one size of an image, null while its variants have not been
+    rendered yet, as the original still carries its EXIF metadata
+    """
+
+    def __init__(
+        self,
+        size: str,
+        image_field: str,
+        variants_field: str,
+        extension: str = "jpeg",
+        **kwargs,
+    ):
+        self.size = size
+        self.image_field = image_field
+        self.variants_field = variants_field
+        self.extension = extension
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        kwargs["allow_null"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        variant = getattr(instance, self.variants_field).get(self.size)
+
+        if not variant or not getattr(instance, self.image_field):
+            return None
+
+        url = default_storage.url(variant[self.extension])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+@extend_schema_field(
+    {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "properties": {
+                "width": {"type": "integer"},
+                "height": {"type": "integer"},
+                "webp": {"type": "string", "format": "uri"},
+                "jpeg": {"type": "string", "format": "uri"},
+            },
+        },
+    }
+)
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Every rendered variant of an image with its dimensions and URLs
+    """
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get("request"))
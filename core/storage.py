@@ -0,0 +1,92 @@
+"""
+Content-addressed media storage.
+
+Files are stored under the SHA-256 of their content, computed while the
+upload is streamed to a temporary file, in a directory tree sharded by
+the first bytes of the hash: `blobs/ab/cd/abcd...<extension>`. Saving a
+file that is already stored only adds a reference to it, so identical
+uploads share one file whatever name they were given.
+
+`delete` releases a reference instead of removing the file. Files are
+removed by the `collect_blobs` task once nothing references them.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from .models import Blob
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    prefix = "blobs"
+
+    def blob_name(self, digest: str, extension: str) -> str:
+        return "/".join(
+            (self.prefix, digest[:2], digest[2:4], digest + extension)
+        )
+
+    def is_blob(self, name: str) -> bool:
+        return name.startswith(self.prefix + "/")
+
+    def _save(self, name, content):
+        temp_dir = os.path.join(self.location, self.prefix, "tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        temp = tempfile.NamedTemporaryFile(dir=temp_dir, delete=False)
+
+        try:
+            with temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+
+            _, extension = os.path.splitext(name)
+            name = self.blob_name(digest.hexdigest(), extension.lower())
+            path = self.path(name)
+
+            # The row lock keeps `collect_blobs` from removing
+            # the file between the check and the new reference
+            with transaction.atomic():
+                Blob.objects.select_for_update().get_or_create(
+                    name=name, defaults={"size": size}
+                )
+
+                if os.path.exists(path):
+                    os.remove(temp.name)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temp.name, path)
+
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+
+                Blob.objects.filter(name=name).update(
+                    ref_count=F("ref_count") + 1
+                )
+        except BaseException:
+            # A failed save must not leave its temporary file behind
+            if os.path.exists(temp.name):
+                os.remove(temp.name)
+            raise
+
+        return name
+
+    def delete(self, name):
+        if not name:
+            return
+
+        if self.is_blob(name):
+            Blob.release(name)
+        else:
+            super().delete(name)
+
+    def remove(self, name) -> None:
+        """Remove a blob's file, whatever references it"""
+        super().delete(name)
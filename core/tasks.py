@@ -0,0 +1,38 @@
+from celery import shared_task
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Blob
+
+
+@shared_task
+def collect_blobs() -> None:
+    """
+    Remove the stored files that have been unreferenced
+    for longer than `settings.BLOB_GC_GRACE`
+    """
+    names = Blob.objects.filter(
+        ref_count=0,
+        updated_at__lt=timezone.now() - settings.BLOB_GC_GRACE,
+    ).values_list("name", flat=True)
+
+    removed = 0
+    for name in names.iterator():
+        with transaction.atomic():
+            blob = (
+                Blob.objects.select_for_update()
+                .filter(name=name, ref_count=0)
+                .first()
+            )
+
+            if blob is None:
+                continue
+
+            default_storage.remove(name)
+            blob.delete()
+            removed += 1
+
+    print(f"{removed} unreferenced blobs removed.")
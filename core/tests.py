@@ -0,0 +1,227 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .models import Blob
+from .routers import ReplicaRouter
+from .tasks import collect_blobs
+from posts.models import Post, PostImage
+from posts.serializers import PostImageListSerializer
+from posts.tasks import process_post_image
+from posts.tests import (
+    authenticated_client,
+    create_user,
+    eager_tasks,
+    image_bytes,
+    temporary_media,
+)
+from users.models import Profile
+
+
+# A replica of the test database, as POSTGRES_REPLICA_HOSTS would add
+if "replica" not in connections.settings:
+    primary = connections.settings[DEFAULT_DB_ALIAS]
+    connections.settings["replica"] = connections.configure_settings(
+        {
+            DEFAULT_DB_ALIAS: primary,
+            "replica": {**primary, "TEST": {"MIRROR": DEFAULT_DB_ALIAS}},
+        }
+    )["replica"]
+
+
+@override_settings(REPLICA_DATABASES=["replica"], REPLICA_PIN_WINDOW=1)
+class ReplicaRouterTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="reader@example.com",
+            username="reader",
+            password="password123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read_profile(self) -> str:
+        """Read the user's profile, returning the database it came from"""
+        with CaptureQueriesContext(
+            connections[DEFAULT_DB_ALIAS]
+        ) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            response = self.client.get(reverse("users:manage-profile"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(bool(primary), bool(replica))
+
+        return "replica" if replica else DEFAULT_DB_ALIAS
+
+    def test_safe_method_reads_from_replica(self):
+        self.assertEqual(self.read_profile(), "replica")
+
+    def test_write_pins_user_to_primary(self):
+        response = self.client.patch(
+            reverse("users:manage-user"), {"username": "renamed"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.read_profile(), DEFAULT_DB_ALIAS)
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.patch(
+            reverse("users:manage-user"), {"email": "invalid"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.read_profile(), "replica")
+
+    def test_reads_return_to_replica_after_pin_window(self):
+        self.client.patch(
+            reverse("users:manage-user"), {"username": "renamed"}
+        )
+        self.assertEqual(self.read_profile(), DEFAULT_DB_ALIAS)
+
+        time.sleep(settings.REPLICA_PIN_WINDOW + 0.1)
+
+        self.assertEqual(self.read_profile(), "replica")
+
+    def test_writes_go_to_primary(self):
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+
+    def test_relations_across_databases_are_allowed(self):
+        profile = Profile.objects.using("replica").get(user=self.user)
+
+        self.assertTrue(ReplicaRouter().allow_relation(profile, self.user))
+
+    def test_migrations_run_on_primary_only(self):
+        router = ReplicaRouter()
+
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, "posts"))
+        self.assertFalse(router.allow_migrate("replica", "posts"))
+
+
+@override_settings(BLOB_GC_GRACE=timedelta(0))
+class BlobStorageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(eager_tasks())
+        self.enterContext(temporary_media())
+        self.user = create_user("author")
+        self.client = authenticated_client(self.user)
+
+    def post_image(self, color: str) -> PostImage:
+        response = self.client.post(
+            reverse("posts:post-list"),
+            {
+                "text": "Photo",
+                "tags": "[]",
+                "images": [SimpleUploadedFile("post.png", image_bytes(color))],
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return PostImage.objects.get(post_id=response.data["id"])
+
+    def upload_picture(self, color: str) -> Profile:
+        response = self.client.put(
+            reverse("users:upload-profile-picture"),
+            {"picture": SimpleUploadedFile("me.png", image_bytes(color))},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return Profile.objects.get(user=self.user)
+
+    @staticmethod
+    def references(name: str) -> int:
+        return Blob.objects.get(name=name).ref_count
+
+    @staticmethod
+    def variant_names(variants: dict) -> list[str]:
+        return [
+            variant[extension]
+            for variant in variants.values()
+            for extension in settings.IMAGE_VARIANT_FORMATS
+        ]
+
+    def test_identical_images_share_one_blob(self):
+        first = self.post_image("red")
+        second = self.post_image("red")
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.references(first.image.name), 2)
+
+    def test_deleted_posts_release_their_blobs(self):
+        first = self.post_image("red")
+        second = self.post_image("red")
+        names = [first.image.name, *self.variant_names(first.variants)]
+
+        first.post.delete()
+
+        self.assertEqual(self.references(first.image.name), 1)
+
+        second.post.delete()
+
+        for name in names:
+            self.assertEqual(self.references(name), 0)
+
+        collect_blobs()
+
+        self.assertFalse(Blob.objects.filter(name__in=names).exists())
+        for name in names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_replaced_picture_is_released(self):
+        previous = self.upload_picture("red")
+
+        profile = self.upload_picture("blue")
+
+        self.assertEqual(self.references(previous.picture.name), 0)
+        for name in self.variant_names(previous.picture_variants):
+            self.assertEqual(self.references(name), 0)
+        self.assertEqual(self.references(profile.picture.name), 1)
+
+    def test_reuploaded_picture_keeps_its_blob(self):
+        previous = self.upload_picture("red")
+
+        profile = self.upload_picture("red")
+        collect_blobs()
+
+        self.assertEqual(profile.picture.name, previous.picture.name)
+        self.assertEqual(self.references(profile.picture.name), 1)
+        self.assertTrue(default_storage.exists(profile.picture.name))
+
+
+class ImageVariantFieldTests(TestCase):
+    def setUp(self):
+        self.enterContext(temporary_media())
+        post = Post.objects.create(user=create_user("author"), text="Photo")
+        self.post_image = PostImage.objects.create(
+            post=post, image=SimpleUploadedFile("post.png", image_bytes())
+        )
+
+    def image_url(self):
+        self.post_image.refresh_from_db()
+        return PostImageListSerializer(self.post_image).data["image"]
+
+    def test_original_is_not_served_before_variants(self):
+        self.assertIsNone(self.image_url())
+
+    def test_rendered_variant_is_served(self):
+        process_post_image(self.post_image.id)
+
+        self.assertEqual(
+            self.image_url(),
+            default_storage.url(self.post_image.variants["feed"]["jpeg"]),
+        )
@@ -0,0 +1,117 @@
+"""
+Token-bucket throttles on the shared Redis connection.
+
+A bucket holds up to `num_requests` tokens of a rate such as `60/min` and
+refills continuously at that rate. Each request takes a token, or is
+throttled until one refills, so a client may burst up to the full rate and
+then sustain it. A bucket is a small hash of its tokens and refill time,
+updated with a single script call per request, so limits are shared by all
+workers and cost the same however many requests a key has made.
+"""
+import functools
+import logging
+
+import redis
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+from .redis import get_redis, local_script
+
+
+logger = logging.getLogger(__name__)
+
+TAKE_TOKEN = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "time")
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call(
+    "HSET", KEYS[1], "tokens", tokens, "time", math.max(now, updated)
+)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+@local_script(TAKE_TOKEN)
+def take_token(data: dict, keys: list, args: list) -> list:
+    """`TAKE_TOKEN` for the in-process stand-in, which does not expire keys"""
+    capacity, rate, now = map(float, args)
+    tokens, updated = data.get(keys[0], (capacity, now))
+    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+    allowed = int(tokens >= 1)
+    tokens -= allowed
+    data[keys[0]] = (tokens, max(updated, now))
+    return [allowed, str(tokens)]
+
+
+@functools.lru_cache(maxsize=None)
+def get_script():
+    return get_redis().register_script(TAKE_TOKEN)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Base throttle limiting each cache key with a token bucket
+    instead of a list of request timestamps
+    """
+
+    def allow_request(self, request, view) -> bool:
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+
+        if self.key is None:
+            return True
+
+        rate = self.num_requests / self.duration
+
+        try:
+            allowed, tokens = get_script()(
+                keys=[self.key],
+                args=[self.num_requests, rate, self.timer()],
+            )
+        except redis.RedisError:
+            # Requests are let through rather than failed
+            logger.exception("Throttling failed")
+            return True
+
+        self.tokens = float(tokens)
+        return bool(allowed)
+
+    def wait(self) -> float:
+        """Seconds until the bucket refills a token"""
+        return (1 - self.tokens) * self.duration / self.num_requests
+
+
+class AnonThrottle(TokenBucketThrottle, AnonRateThrottle):
+    """
+    Limit anonymous users by IP address at the `anon` rate
+    """
+
+
+class UserThrottle(TokenBucketThrottle, UserRateThrottle):
+    """
+    Limit authenticated users by id, and others by IP address,
+    at the `user` rate
+    """
+
+
+class ScopedThrottle(ScopedRateThrottle, TokenBucketThrottle):
+    """
+    Limit requests to views with a `throttle_scope`
+    at the rate of the scope, in addition to the other throttles
+    """
@@ -0,0 +1,20 @@
+from django.http import HttpResponse
+from drf_spectacular.utils import extend_schema
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+
+@extend_schema(exclude=True)
+class MetricsView(APIView):
+    """
+    Expose application metrics in the Prometheus text format
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            generate_latest(),
+            content_type=CONTENT_TYPE_LATEST,
+        )
@@ -0,0 +1,216 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotAuthenticated, NotFound
+from rest_framework.response import Response
+
+from taggit.models import Tag
+
+from . import streams
+from .models import Post
+from .serializers import PostListSerializer, PostRetrieveSerializer
+from .timelines import get_timeline_backend
+from .views import PostViewSet
+from core.async_views import AsyncReadView
+from core.authentication import QueryTokenAuthentication
+from core.cache import acached_response, aconditional_response
+from core.pagination import KeysetPagination
+from core.pubsub import get_hub
+
+
+class AsyncPostMixin:
+    def get_queryset(self):
+        return (
+            Post.objects.filter(published=True)
+            .select_related("user__profile")
+            .prefetch_related("images", "tags")
+            .defer("search_vector")
+        )
+
+    async def paginated_response(self, request, fetch=None, queryset=None):
+        paginator = KeysetPagination()
+
+        if fetch is not None:
+            page = await paginator.apaginate_fetch(fetch, request)
+        else:
+            page = await paginator.apaginate_queryset(queryset, request)
+
+        serializer = PostListSerializer(
+            page, many=True, context=self.get_serializer_context(request)
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+
+class PostListAsyncView(AsyncPostMixin, AsyncReadView):
+    """
+    List all posts
+    """
+
+    fallback = PostViewSet.as_view(
+        {"get": "list", "post": "create"}, basename="post", detail=False
+    )
+
+    def is_async(self, request) -> bool:
+        # Searches and user filters keep their synchronous filter backends
+        return super().is_async(request) and not (
+            request.GET.get("search") or "user" in request.GET
+        )
+
+    async def filter_tags(self, queryset, tags: str, match_all=False):
+        names = PostViewSet.tag_names(tags)
+        tag_ids = [
+            tag_id
+            async for tag_id in Tag.objects.filter(
+                name__in=names
+            ).values_list("id", flat=True)
+        ]
+
+        return PostViewSet.filter_tag_ids(queryset, names, tag_ids, match_all)
+
+    async def get(self, request, *args, **kwargs):
+        params = request.query_params
+
+        async def build():
+            queryset = self.get_queryset()
+            tags_all = params.get("tags_all")
+            tags_any = params.get("tags_any") or params.get("tags")
+
+            if tags_all:
+                queryset = await self.filter_tags(
+                    queryset, tags_all, match_all=True
+                )
+
+            if tags_any:
+                queryset = await self.filter_tags(queryset, tags_any)
+
+            return await self.paginated_response(request, queryset=queryset)
+
+        if "since" in params or "until" in params:
+            return await aconditional_response(
+                request, "posts", (("posts",),), build, request.get_full_path()
+            )
+
+        return await acached_response(request, "posts", (("posts",),), build)
+
+
+class PostDetailAsyncView(AsyncPostMixin, AsyncReadView):
+    """
+    Retrieve a post
+    """
+
+    fallback = PostViewSet.as_view(
+        {
+            "get": "retrieve",
+            "put": "update",
+            "patch": "partial_update",
+            "delete": "destroy",
+        },
+        basename="post",
+        detail=True,
+    )
+
+    async def get(self, request, pk, *args, **kwargs):
+        async def build():
+            post = await self.get_queryset().filter(pk=pk).afirst()
+
+            if post is None:
+                raise NotFound()
+
+            serializer = PostRetrieveSerializer(
+                post, context=self.get_serializer_context(request)
+            )
+            return Response(serializer.data)
+
+        return await acached_response(
+            request, "post", (("post", pk), ("profiles",)), build
+        )
+
+
+class HomeAsyncView(AsyncPostMixin, AsyncReadView):
+    """
+    Retrieve posts created by the current user
+    or the users they are following
+    """
+
+    fallback = PostViewSet.as_view(
+        {"get": "home"}, basename="post", detail=False
+    )
+    throttle_scope = "home"
+
+    async def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise NotAuthenticated()
+
+        backend = get_timeline_backend()
+        queryset = self.get_queryset()
+        user_id = request.user.id
+
+        async def fetch(limit, since, until):
+            post_ids = await sync_to_async(backend.fetch)(
+                user_id, limit, since, until
+            )
+            posts = await queryset.ain_bulk(post_ids)
+            return [posts[pk] for pk in post_ids if pk in posts]
+
+        async def build():
+            return await self.paginated_response(request, fetch=fetch)
+
+        return await aconditional_response(
+            request,
+            "home",
+            (("timeline", user_id), ("posts",)),
+            build,
+            request.get_full_path(),
+        )
+
+
+class PostStreamView(AsyncReadView):
+    """
+    Stream the current user's new home posts as Server-Sent Events.
+    Each `post` event's id is a cursor for `home/?since=`.
+
+    Django 4.2 does not notice clients disconnecting mid-stream,
+    so a stream ends after `settings.STREAM_MAX_AGE` seconds
+    and `EventSource` reconnects.
+    """
+
+    authentication_classes = (
+        *AsyncReadView.authentication_classes,
+        QueryTokenAuthentication,
+    )
+
+    async def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise NotAuthenticated()
+
+        response = StreamingHttpResponse(
+            self.events(streams.channel(request.user.id)),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Keeps proxies such as nginx from buffering events
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    async def events(channel: str):
+        hub = get_hub()
+        queue = await hub.subscribe(channel)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.STREAM_MAX_AGE
+
+        try:
+            yield ": connected\n\n"
+
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    yield await asyncio.wait_for(
+                        queue.get(),
+                        min(settings.STREAM_HEARTBEAT, remaining),
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            await hub.unsubscribe(channel, queue)
@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from posts.models import PostImage
+from posts.tasks import process_post_image
+from users.models import Profile
+from users.tasks import process_profile_picture
+
+
+class Command(BaseCommand):
+    """Django command to queue the images that have no variants yet"""
+
+    def handle(self, *args, **kwargs):
+        images = PostImage.objects.filter(variants={}).values_list(
+            "id", flat=True
+        )
+        profiles = (
+            Profile.objects.filter(picture_variants={})
+            .exclude(picture="")
+            .exclude(picture__isnull=True)
+            .values_list("id", flat=True)
+        )
+
+        queued = 0
+
+        for image_id in images.iterator():
+            process_post_image.delay(image_id)
+            queued += 1
+
+        for profile_id in profiles.iterator():
+            process_profile_picture.delay(profile_id)
+            queued += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{queued} images queued!"))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from posts.models import Post
+from posts.timelines import get_timeline_backend
+
+
+class Command(BaseCommand):
+    """Django command to materialize home timelines from existing posts"""
+
+    def handle(self, *args, **kwargs):
+        backend = get_timeline_backend()
+        users = get_user_model().objects.values_list("id", flat=True)
+
+        for user_id in users.iterator():
+            posts = Post.objects.filter(
+                user__profile__followers__user_id=user_id,
+                published=True,
+            ).only("id", "user_id", "created_at")
+            own_posts = Post.objects.filter(
+                user_id=user_id,
+                published=True,
+            ).only("id", "user_id", "created_at")
+
+            limit = settings.TIMELINE_MAX_LENGTH
+            backend.backfill(user_id, posts[:limit])
+            backend.backfill(user_id, own_posts[:limit])
+
+        self.stdout.write(self.style.SUCCESS("Timelines rebuilt!"))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0002_timelineentry"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("published", True)),
+                fields=["-created_at", "-id"],
+                name="post_published_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="post_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["parent", "-created_at", "-id"], name="post_parent_created_idx"
+            ),
+        ),
+    ]
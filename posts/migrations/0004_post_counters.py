@@ -0,0 +1,48 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+
+    likes = (
+        Post.likes.through.objects.filter(post_id=OuterRef("pk"))
+        .values("post_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    replies = (
+        Post.objects.filter(parent_id=OuterRef("pk"), published=True)
+        .order_by()
+        .values("parent_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+
+    Post.objects.update(
+        like_count=Coalesce(Subquery(likes), 0),
+        reply_count=Coalesce(Subquery(replies), 0),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0003_post_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="like_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="reply_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:31
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def index_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS post_search_vector_idx "
+        "ON posts_post USING gin (search_vector)"
+    )
+    # Vectors must use the configuration queries are parsed with
+    schema_editor.execute(
+        "UPDATE posts_post SET search_vector = to_tsvector(%s::regconfig, text)",
+        [settings.SEARCH_CONFIG],
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS post_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0004_post_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(index_search_vectors, drop_search_index),
+    ]
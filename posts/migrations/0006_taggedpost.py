@@ -0,0 +1,153 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import taggit.managers
+
+
+def copy_post_tags(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    TaggedItem = apps.get_model("taggit", "TaggedItem")
+    TaggedPost = apps.get_model("posts", "TaggedPost")
+    Post = apps.get_model("posts", "Post")
+
+    content_type = ContentType.objects.filter(
+        app_label="posts", model="post"
+    ).first()
+
+    if content_type is None:
+        return
+
+    items = TaggedItem.objects.filter(content_type=content_type)
+    rows = items.order_by("pk").values_list("pk", "tag_id", "object_id")
+    last_pk = 0
+
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:1000])
+
+        if not batch:
+            break
+
+        created = dict(
+            Post.objects.filter(
+                pk__in={object_id for _, _, object_id in batch}
+            ).values_list("pk", "created_at")
+        )
+        TaggedPost.objects.bulk_create(
+            (
+                TaggedPost(
+                    tag_id=tag_id,
+                    content_object_id=object_id,
+                    created_at=created[object_id],
+                )
+                for _, tag_id, object_id in batch
+                if object_id in created
+            ),
+            ignore_conflicts=True,
+        )
+        last_pk = batch[-1][0]
+
+    items.delete()
+
+
+def restore_post_tags(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    TaggedItem = apps.get_model("taggit", "TaggedItem")
+    TaggedPost = apps.get_model("posts", "TaggedPost")
+
+    content_type, _ = ContentType.objects.get_or_create(
+        app_label="posts", model="post"
+    )
+    rows = TaggedPost.objects.order_by("pk").values_list(
+        "pk", "tag_id", "content_object_id"
+    )
+    last_pk = 0
+
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:1000])
+
+        if not batch:
+            break
+
+        TaggedItem.objects.bulk_create(
+            (
+                TaggedItem(
+                    tag_id=tag_id,
+                    content_type=content_type,
+                    object_id=object_id,
+                )
+                for _, tag_id, object_id in batch
+            ),
+            ignore_conflicts=True,
+        )
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "taggit",
+            "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx",
+        ),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("posts", "0005_post_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaggedPost",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "content_object",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tagged_items",
+                        to="posts.post",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(app_label)s_%(class)s_items",
+                        to="taggit.tag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="tags",
+            field=taggit.managers.TaggableManager(
+                blank=True,
+                help_text="A comma-separated list of tags.",
+                through="posts.TaggedPost",
+                to="taggit.Tag",
+                verbose_name="Tags",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taggedpost",
+            index=models.Index(
+                fields=["tag", "-created_at", "-content_object"],
+                name="tagged_post_tag_created_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="taggedpost",
+            constraint=models.UniqueConstraint(
+                fields=("content_object", "tag"), name="unique_post_tag"
+            ),
+        ),
+        migrations.RunPython(copy_post_tags, restore_post_tags),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "taggit",
+            "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx",
+        ),
+        ("posts", "0006_taggedpost"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TrendingTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "window",
+                    models.CharField(
+                        choices=[
+                            ("1h", "Last hour"),
+                            ("24h", "Last 24 hours"),
+                            ("7d", "Last 7 days"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("count", models.PositiveIntegerField()),
+                ("computed_at", models.DateTimeField()),
+            ],
+            options={
+                "ordering": ("window", "rank"),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="taggedpost",
+            index=models.Index(fields=["created_at"], name="tagged_post_created_idx"),
+        ),
+        migrations.AddField(
+            model_name="trendingtag",
+            name="tag",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="taggit.tag",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tagusage",
+            name="tag",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="taggit.tag",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="trendingtag",
+            constraint=models.UniqueConstraint(
+                fields=("window", "rank"), name="unique_trending_tag_rank"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tagusage",
+            index=models.Index(fields=["hour"], name="tag_usage_hour_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="tagusage",
+            constraint=models.UniqueConstraint(
+                fields=("tag", "hour"), name="unique_tag_usage_hour"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0007_trending_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="postimage",
+            name="variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.6 on 2026-10-18 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0009_upload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="publish_at",
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("published", False)),
+                fields=["publish_at", "id"],
+                name="post_scheduled_idx",
+            ),
+        ),
+    ]
@@ -1,11 +1,17 @@
 import os
 import uuid
 
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.text import slugify
 
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItemBase
+
+from core.cache import bump_versions
+from core.db import add_edges, remove_edges
 
 
 class Post(models.Model):
@@ -31,27 +37,129 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published = models.BooleanField(default=True)
+    publish_at = models.DateTimeField(null=True, blank=True, default=None)
+    like_count = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
 
-    tags = TaggableManager(blank=True)
+    tags = TaggableManager(blank=True, through="TaggedPost")
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = (
+            models.Index(
+                fields=("-created_at", "-id"),
+                name="post_published_created_idx",
+                condition=models.Q(published=True),
+            ),
+            models.Index(
+                fields=("publish_at", "id"),
+                name="post_scheduled_idx",
+                condition=models.Q(published=False),
+            ),
+            models.Index(
+                fields=("user", "-created_at", "-id"),
+                name="post_user_created_idx",
+            ),
+            models.Index(
+                fields=("parent", "-created_at", "-id"),
+                name="post_parent_created_idx",
+            ),
+        )
 
     def __str__(self) -> str:
         return f"{self.user}: {self.text}"
 
-    @property
-    def like_count(self) -> int:
-        return self.likes.count()
+    @classmethod
+    def change_like_count(cls, post_id: int, delta: int) -> None:
+        cls._change_counter((post_id,), "like_count", delta)
 
-    @property
-    def reply_count(self) -> int:
-        return self.replies.count()
+    @classmethod
+    def change_like_counts(cls, post_ids, delta: int) -> None:
+        """Add `delta` to the likes of several posts in a single update"""
+        cls._change_counter(post_ids, "like_count", delta)
+
+    @classmethod
+    def change_reply_count(cls, post_id: int, delta: int) -> None:
+        cls._change_counter((post_id,), "reply_count", delta)
+
+    @classmethod
+    def _change_counter(cls, post_ids, field: str, delta: int) -> None:
+        post_ids = list(post_ids)
+
+        if not post_ids:
+            return
+
+        posts = cls.objects.filter(pk__in=post_ids)
+
+        if delta < 0:
+            posts = posts.filter(**{f"{field}__gte": -delta})
+
+        posts.update(**{field: models.F(field) + delta})
+        bump_versions(
+            (*(("post", post_id) for post_id in post_ids), ("posts",))
+        )
+
+    @classmethod
+    def add_likes(cls, user_id: int, post_ids) -> list[int]:
+        """
+        Like posts with a single insert that skips existing likes,
+        returning the ids of the posts that were not liked before
+        """
+        return add_edges(cls.likes.through, "user", user_id, "post", post_ids)
+
+    @classmethod
+    def remove_likes(cls, user_id: int, post_ids) -> list[int]:
+        """
+        Unlike posts with a single delete,
+        returning the ids of the posts that were liked
+        """
+        return remove_edges(
+            cls.likes.through, "user", user_id, "post", post_ids
+        )
+
+
+class TaggedPost(TaggedItemBase):
+    """
+    Tag assignment of a post, carrying the post's creation time
+    so posts with a tag can be read newest first from one index
+    """
+
+    content_object = models.ForeignKey(
+        Post,
+        related_name="tagged_items",
+        on_delete=models.CASCADE,
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("content_object", "tag"),
+                name="unique_post_tag",
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("tag", "-created_at", "-content_object"),
+                name="tagged_post_tag_created_idx",
+            ),
+            models.Index(
+                fields=("created_at",),
+                name="tagged_post_created_idx",
+            ),
+        )
+
+    def save(self, *args, **kwargs):
+        if self.created_at is None:
+            self.created_at = self.content_object.created_at
+
+        super().save(*args, **kwargs)
 
 
 def generate_file_name(info, filename):
     _, extension = os.path.splitext(filename)
-    filename = f"{slugify(info)}-{uuid.uuid4()}{extension}"
+    filename = f"{slugify(info)}{extension}"
 
     return filename
 
@@ -71,6 +179,158 @@ class PostImage(models.Model):
     image = models.ImageField(
         upload_to=post_image_file_path,
     )
+    # Storage names and dimensions of the resized copies by size,
+    # empty until `process_post_image` has rendered them
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.id}: {self.post}"
+
+
+class Upload(models.Model):
+    """
+    A resumable upload of a post image, written chunk by chunk
+    to a temporary file until it is attached to a post
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        COMPLETE = "complete", "Complete"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        get_user_model(),
+        related_name="uploads",
+        on_delete=models.CASCADE,
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.user}: {self.filename}"
+
+    @property
+    def path(self) -> str:
+        return os.path.join(settings.UPLOAD_TEMP_DIR, f"{self.id}.part")
+
+    def delete(self, *args, **kwargs):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+        return super().delete(*args, **kwargs)
+
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized into a user's home timeline
+    """
+
+    owner = models.ForeignKey(
+        get_user_model(),
+        related_name="timeline_entries",
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name="timeline_entries",
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        get_user_model(),
+        related_name="+",
+        null=True,
+        on_delete=models.CASCADE,
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ("-created_at", "-post_id")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("owner", "post"),
+                name="unique_timeline_entry",
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("owner", "-created_at", "-post"),
+                name="timeline_owner_created_idx",
+            ),
+            models.Index(
+                fields=("owner", "author"),
+                name="timeline_owner_author_idx",
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.owner}: {self.post_id}"
+
+
+class TagUsage(models.Model):
+    """
+    Number of published posts tagged with a tag within an hour
+    """
+
+    tag = models.ForeignKey(
+        Tag,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("tag", "hour"),
+                name="unique_tag_usage_hour",
+            ),
+        )
+        indexes = (
+            models.Index(fields=("hour",), name="tag_usage_hour_idx"),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.tag} at {self.hour}: {self.count}"
+
+
+class TrendingTag(models.Model):
+    """
+    Precomputed ranking of the most used tags within a time window
+    """
+
+    class Window(models.TextChoices):
+        HOUR = "1h", "Last hour"
+        DAY = "24h", "Last 24 hours"
+        WEEK = "7d", "Last 7 days"
+
+    window = models.CharField(max_length=3, choices=Window.choices)
+    rank = models.PositiveSmallIntegerField()
+    tag = models.ForeignKey(
+        Tag,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    count = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ("window", "rank")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("window", "rank"),
+                name="unique_trending_tag_rank",
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.window} #{self.rank}: {self.tag}"
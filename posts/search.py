@@ -0,0 +1,279 @@
+"""
+Full-text search over posts.
+
+On PostgreSQL posts are matched against a stored `search_vector` column
+backed by a GIN index. Other databases, such as SQLite in tests and small
+deployments, fall back to an inverted index held in process memory.
+Both rank matches by relevance with a boost for recent posts and are kept
+current by the `post_save` and `post_delete` signals.
+"""
+import functools
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timezone
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import (
+    Case,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Value,
+    When,
+)
+from django.db.models.functions import Extract, Power
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Post
+
+
+class BaseSearchBackend:
+    def index(self, post: Post) -> None:
+        """Add or refresh a post in the index"""
+        raise NotImplementedError
+
+    def index_many(self, posts) -> None:
+        """Add or refresh many posts, e.g. bulk created ones"""
+        for post in posts:
+            self.index(post)
+
+    def remove(self, post_id: int) -> None:
+        """Drop a post from the index"""
+        raise NotImplementedError
+
+    def search(self, queryset, query: str):
+        """
+        Restrict a post queryset to the matches of `query`,
+        annotated with `search_rank` and ordered by it
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def recency_boost(age_seconds: float) -> float:
+        """Boost that halves every `SEARCH_RECENCY_HALF_LIFE` seconds"""
+        half_life = settings.SEARCH_RECENCY_HALF_LIFE.total_seconds()
+        return 0.5 ** (max(age_seconds, 0) / half_life)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    def vector(self):
+        return SearchVector("text", config=settings.SEARCH_CONFIG)
+
+    def index(self, post):
+        Post.objects.filter(pk=post.pk).update(search_vector=self.vector())
+
+    def index_many(self, posts):
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+            search_vector=self.vector()
+        )
+
+    def remove(self, post_id):
+        # The vector is stored on the post row and goes away with it
+        pass
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(
+            query,
+            config=settings.SEARCH_CONFIG,
+            search_type="websearch",
+        )
+        half_life = settings.SEARCH_RECENCY_HALF_LIFE.total_seconds()
+        age = ExpressionWrapper(
+            # In UTC, as the epoch of a local time is off by its offset
+            Value(time.time())
+            - Extract("created_at", "epoch", tzinfo=timezone.utc),
+            output_field=FloatField(),
+        )
+        boost = Power(Value(0.5), age / Value(half_life))
+
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(
+                search_rank=SearchRank(F("search_vector"), search_query)
+                * (Value(1.0) + boost)
+            )
+            .order_by("-search_rank", "-id")
+        )
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Inverted index of post terms built from the database on first use.
+    Every matched term contributes its TF-IDF weight to the rank.
+    """
+
+    token_pattern = re.compile(r"\w+")
+    # Post ids per query when filtering matches, below SQLite's limit
+    batch_size = 900
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self._postings = defaultdict(dict)
+        self._documents = {}
+
+    def tokenize(self, text: str) -> Counter:
+        return Counter(self.token_pattern.findall(text.lower()))
+
+    def _add(self, post_id, text, created_at):
+        self._discard(post_id)
+        terms = self.tokenize(text)
+
+        for term, count in terms.items():
+            self._postings[term][post_id] = count
+
+        self._documents[post_id] = (tuple(terms), created_at.timestamp())
+
+    def _discard(self, post_id):
+        terms, _ = self._documents.pop(post_id, ((), None))
+
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(post_id, None)
+
+            if not postings:
+                del self._postings[term]
+
+    def _build(self):
+        posts = Post.objects.values_list("id", "text", "created_at")
+
+        for post_id, text, created_at in posts.iterator():
+            self._add(post_id, text, created_at)
+
+        self._ready = True
+
+    def index(self, post):
+        with self._lock:
+            if self._ready:
+                self._add(post.pk, post.text, post.created_at)
+
+    def remove(self, post_id):
+        with self._lock:
+            if self._ready:
+                self._discard(post_id)
+
+    def rank(self, query: str) -> list[tuple[int, float]]:
+        """Return `(post_id, rank)` pairs of posts matching every term"""
+        terms = list(self.tokenize(query))
+
+        if not terms:
+            return []
+
+        with self._lock:
+            if not self._ready:
+                self._build()
+
+            postings = [self._postings.get(term, {}) for term in terms]
+            total = len(self._documents)
+            matches = set.intersection(*(set(p) for p in postings))
+            created = {
+                post_id: self._documents[post_id][1] for post_id in matches
+            }
+
+        now = time.time()
+        ranks = []
+
+        for post_id in matches:
+            score = sum(
+                (1 + math.log(p[post_id])) * math.log(1 + total / len(p))
+                for p in postings
+            )
+            boost = self.recency_boost(now - created[post_id])
+            ranks.append((post_id, score * (1 + boost)))
+
+        ranks.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return ranks
+
+    def filter_ranks(self, queryset, ranks) -> list[tuple[int, float]]:
+        """
+        Keep the best `SEARCH_MAX_RESULTS` ranks of posts in `queryset`,
+        checking matches in rank order a batch at a time
+        """
+        kept = []
+
+        for start in range(0, len(ranks), self.batch_size):
+            batch = ranks[start:start + self.batch_size]
+            found = set(
+                queryset.filter(
+                    pk__in=[post_id for post_id, _ in batch]
+                ).values_list("pk", flat=True)
+            )
+            kept += [item for item in batch if item[0] in found]
+
+            if len(kept) >= settings.SEARCH_MAX_RESULTS:
+                break
+
+        return kept[: settings.SEARCH_MAX_RESULTS]
+
+    def search(self, queryset, query):
+        # Limited after the view's filters, so filtered searches
+        # are not cut short by posts they exclude
+        ranks = self.filter_ranks(queryset, self.rank(query))
+
+        if not ranks:
+            return queryset.none()
+
+        search_rank = Case(
+            *(When(pk=post_id, then=Value(rank)) for post_id, rank in ranks),
+            output_field=FloatField(),
+        )
+
+        return (
+            queryset.filter(pk__in=[post_id for post_id, _ in ranks])
+            .annotate(search_rank=search_rank)
+            .order_by("-search_rank", "-id")
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_search_backend() -> BaseSearchBackend:
+    backend = settings.SEARCH_BACKEND
+
+    if backend is None:
+        backend = (
+            "posts.search.PostgresSearchBackend"
+            if connection.vendor == "postgresql"
+            else "posts.search.InMemorySearchBackend"
+        )
+
+    return import_string(backend)()
+
+
+class PostSearchFilter(BaseFilterBackend):
+    """
+    Filter posts with the configured search backend
+    """
+
+    search_param = "search"
+
+    def get_search_query(self, request) -> str:
+        return request.query_params.get(self.search_param, "").strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+
+        if not query:
+            return queryset
+
+        return get_search_backend().search(queryset, query)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Search by text",
+                "schema": {"type": "string"},
+            },
+        ]
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
 from taggit.serializers import (
@@ -5,22 +7,31 @@ from taggit.serializers import (
     TaggitSerializer,
 )
 
-from .models import Post, PostImage
+from .models import Post, PostImage, TrendingTag, Upload
+from .tasks import process_post_image
+from .uploads import attach
+from core.serializers import ImageVariantField, ImageVariantsField
 from users.serializers import (
     ProfileListSerializer,
 )
 
 
 class PostImageSerializer(serializers.ModelSerializer):
+    image = ImageVariantField("full", "image", "variants")
+    variants = ImageVariantsField()
+
     class Meta:
         model = PostImage
-        fields = ("id", "image")
+        fields = ("id", "image", "variants")
 
 
 class PostImageListSerializer(serializers.ModelSerializer):
+    image = ImageVariantField("feed", "image", "variants")
+    variants = ImageVariantsField()
+
     class Meta:
         model = PostImage
-        fields = ("image",)
+        fields = ("image", "variants")
 
 
 class PostSerializer(
@@ -32,6 +43,12 @@ class PostSerializer(
         write_only=True,
         required=False,
     )
+    uploads = serializers.PrimaryKeyRelatedField(
+        queryset=Upload.objects.filter(status=Upload.Status.COMPLETE),
+        many=True,
+        write_only=True,
+        required=False,
+    )
     tags = TagListSerializerField(
         child=serializers.CharField(allow_blank=True, allow_null=True),
     )
@@ -50,6 +67,27 @@ class PostSerializer(
 
         return images
 
+    def validate_uploads(self, uploads):
+        user = self.context["request"].user
+
+        if any(upload.user_id != user.id for upload in uploads):
+            raise serializers.ValidationError(
+                "Uploads must belong to the current user"
+            )
+
+        return list({upload.pk: upload for upload in uploads}.values())
+
+    def validate(self, attrs):
+        images = attrs.get("images") or []
+        uploads = attrs.get("uploads") or []
+
+        if len(images) + len(uploads) > 10:
+            raise serializers.ValidationError(
+                {"images": "Cannot upload more than 10 images to a post"}
+            )
+
+        return attrs
+
     class Meta:
         model = Post
         fields = (
@@ -58,6 +96,7 @@ class PostSerializer(
             "parent",
             "text",
             "images",
+            "uploads",
             "created_at",
             "updated_at",
             "tags",
@@ -66,9 +105,14 @@ class PostSerializer(
 
     def create(self, validated_data):
         images = validated_data.pop("images", None) or []
+        uploads = validated_data.pop("uploads", None) or []
         post = super().create(validated_data)
         for image in images:
-            PostImage.objects.create(post=post, image=image)
+            post_image = PostImage.objects.create(post=post, image=image)
+            process_post_image.delay(post_image.id)
+        for upload in uploads:
+            post_image = attach(upload, post)
+            process_post_image.delay(post_image.id)
         return post
 
 
@@ -83,6 +127,7 @@ class PostCreateSerializer(PostSerializer):
             "parent",
             "text",
             "images",
+            "uploads",
             "created_at",
             "updated_at",
             "tags",
@@ -159,3 +204,108 @@ class PostRetrieveSerializer(
             "updated_at",
             "tags",
         )
+
+
+class LikeBatchSerializer(serializers.Serializer):
+    max_posts = 100
+
+    like = serializers.ListField(
+        child=serializers.IntegerField(),
+        max_length=max_posts,
+        required=False,
+    )
+    unlike = serializers.ListField(
+        child=serializers.IntegerField(),
+        max_length=max_posts,
+        required=False,
+    )
+
+    def validate(self, attrs):
+        if set(attrs.get("like", [])) & set(attrs.get("unlike", [])):
+            raise serializers.ValidationError(
+                "Cannot like and unlike the same post"
+            )
+
+        count = len(attrs.get("like", [])) + len(attrs.get("unlike", []))
+
+        if not count:
+            raise serializers.ValidationError("No posts given")
+
+        if count > self.max_posts:
+            raise serializers.ValidationError(
+                f"Cannot change more than {self.max_posts} posts at once"
+            )
+
+        return attrs
+
+
+class LikeStateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    liked = serializers.BooleanField()
+
+
+class ScheduledPostSerializer(serializers.ModelSerializer):
+    parent = serializers.HyperlinkedRelatedField(
+        view_name="posts:post-detail", read_only=True
+    )
+    images = PostImageListSerializer(many=True, read_only=True)
+    tags = TagListSerializerField(read_only=True)
+    publish_at = serializers.DateTimeField()
+
+    class Meta:
+        model = Post
+        fields = (
+            "id",
+            "parent",
+            "text",
+            "images",
+            "tags",
+            "created_at",
+            "publish_at",
+        )
+        read_only_fields = ("text", "created_at")
+
+    def validate_publish_at(self, publish_at):
+        if publish_at <= timezone.now():
+            raise serializers.ValidationError("Must be in the future")
+
+        return publish_at
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Upload
+        fields = (
+            "id",
+            "filename",
+            "size",
+            "offset",
+            "status",
+            "created_at",
+        )
+        read_only_fields = ("offset", "status")
+        extra_kwargs = {"size": {"min_value": 1}}
+
+    def validate_size(self, size):
+        if size > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                "Max image size exceeded: "
+                f"{settings.UPLOAD_MAX_SIZE // 1_000_000} MB"
+            )
+
+        return size
+
+
+class TrendingTagSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="tag.name", read_only=True)
+    slug = serializers.CharField(source="tag.slug", read_only=True)
+
+    class Meta:
+        model = TrendingTag
+        fields = (
+            "rank",
+            "name",
+            "slug",
+            "count",
+            "computed_at",
+        )
@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import streams
+from .models import Post, PostImage, TaggedPost
+from core.cache import bump_versions
+from core.images import delete_variants
+from .search import get_search_backend
+from .timelines import get_timeline_backend
+
+
+# Sent with `post` once a post becomes visible,
+# either on creation or when a scheduled post is published
+post_published = Signal()
+
+
+@receiver(post_published)
+def count_reply(sender, post, **kwargs):
+    if post.parent_id:
+        Post.change_reply_count(post.parent_id, 1)
+
+
+@receiver(post_published)
+def push_to_timelines(sender, post, **kwargs):
+    # Imported here because the tasks module sends `post_published`
+    from .tasks import fan_out_post
+
+    get_timeline_backend().push(post, (post.user_id,))
+    bump_versions((("timeline", post.user_id),))
+    streams.publish(post, (post.user_id,))
+    fan_out_post.delay(post.id)
+
+
+@receiver(post_published)
+def sync_tag_index(sender, post, **kwargs):
+    # Scheduled posts take their creation time when published
+    TaggedPost.objects.filter(content_object_id=post.id).exclude(
+        created_at=post.created_at
+    ).update(created_at=post.created_at)
+
+
+@receiver(post_delete, sender=Post)
+def discount_reply(sender, instance, **kwargs):
+    if instance.published and instance.parent_id:
+        Post.change_reply_count(instance.parent_id, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    bump_versions((("post", instance.pk), ("posts",)))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_delete, sender=PostImage)
+def release_image_files(sender, instance, **kwargs):
+    instance.image.delete(save=False)
+    delete_variants(instance.variants)
@@ -0,0 +1,30 @@
+"""
+New posts streamed to followers over Server-Sent Events.
+
+Publishing a post sends an event to the stream channel of every user whose
+home timeline it enters, alongside the timeline push. Events are published
+already framed and carry the post's home cursor as their id, so a client
+fetches new posts with `home/?since=<id>`, also after reconnecting with
+the `Last-Event-ID` it received last.
+"""
+import json
+
+from core.pagination import KeysetPagination
+from core.pubsub import publish_many
+
+
+def channel(user_id: int) -> str:
+    return f"stream:{user_id}"
+
+
+def event(post) -> str:
+    cursor = KeysetPagination.encode_cursor((post.created_at, post.id))
+    data = json.dumps({"id": post.id, "user": post.user_id})
+
+    return f"id: {cursor}\nevent: post\ndata: {data}\n\n"
+
+
+def publish(post, user_ids) -> None:
+    """Notify the streams of the given users of a new post"""
+    frame = event(post)
+    publish_many((channel(user_id), frame) for user_id in user_ids)
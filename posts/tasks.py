@@ -1,16 +1,309 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from celery import shared_task
 
-from .models import Post
+from .models import (
+    Post,
+    PostImage,
+    TaggedPost,
+    TagUsage,
+    TrendingTag,
+    Upload,
+)
+from . import streams
+from .signals import post_published
+from .timelines import get_timeline_backend
+from core.cache import bump_versions
+from core.images import delete_variants, render_variants
+from users.models import Profile
 
 
 @shared_task
 def defer_post(post_id: int) -> None:
+    """
+    Publish a post scheduled with an ETA message
+    before `publish_at` was stored
+    """
     post = Post.objects.get(pk=post_id)
 
+    if post.published:
+        return
+
     post.published = True
     post.created_at = timezone.now()
     post.save()
 
+    post_published.send(sender=Post, post=post)
+
     print(f"Post {post.id} published.")
+
+
+@shared_task
+def publish_scheduled_posts(batch_size: int = 500) -> None:
+    """
+    Publish the posts whose `publish_at` has passed, a batch at a time.
+    Each batch is claimed and published by a single update, then
+    `post_published` is sent for its posts.
+    """
+    published = 0
+
+    while True:
+        now = timezone.now()
+
+        with transaction.atomic():
+            post_ids = list(
+                Post.objects.filter(published=False, publish_at__lte=now)
+                .order_by("publish_at", "id")
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            Post.objects.filter(pk__in=post_ids).update(
+                published=True, created_at=now, updated_at=now
+            )
+
+        if not post_ids:
+            break
+
+        posts = Post.objects.filter(pk__in=post_ids).order_by("publish_at")
+        bump_versions(
+            [("posts",), *(("post", post_id) for post_id in post_ids)]
+        )
+
+        for post in posts:
+            post_published.send(sender=Post, post=post)
+
+        published += len(post_ids)
+
+    print(f"{published} scheduled posts published.")
+
+
+@shared_task
+def process_post_image(image_id: int) -> None:
+    """
+    Render the resized variants of a post image
+    """
+    image = PostImage.objects.filter(pk=image_id).first()
+
+    if image is None or not image.image:
+        return
+
+    with image.image.open("rb") as file:
+        variants = render_variants(file, image.image.name)
+
+    PostImage.objects.filter(pk=image_id).update(variants=variants)
+    delete_variants(image.variants)
+    bump_versions((("post", image.post_id), ("posts",)))
+
+    print(f"Post image {image_id} processed.")
+
+
+@shared_task
+def fan_out_post(post_id: int) -> None:
+    """
+    Push a published post into the timelines of its author's followers
+    """
+    post = Post.objects.filter(pk=post_id, published=True).first()
+
+    if post is None or post.user_id is None:
+        return
+
+    backend = get_timeline_backend()
+    batch_size = settings.TIMELINE_FAN_OUT_BATCH_SIZE
+    follower_ids = (
+        Profile.objects.filter(following__user_id=post.user_id)
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+
+    def push(user_ids):
+        backend.push(post, user_ids)
+        bump_versions(("timeline", user_id) for user_id in user_ids)
+        streams.publish(post, user_ids)
+
+    batch = []
+    for user_id in follower_ids:
+        batch.append(user_id)
+
+        if len(batch) == batch_size:
+            push(batch)
+            batch = []
+
+    if batch:
+        push(batch)
+
+
+@shared_task
+def backfill_timeline(user_id: int, author_id: int) -> None:
+    """
+    Add an author's recent posts to the timeline of a new follower
+    """
+    posts = Post.objects.filter(
+        user_id=author_id, published=True
+    ).only("id", "user_id", "created_at")[
+        : settings.TIMELINE_BACKFILL_SIZE
+    ]
+
+    get_timeline_backend().backfill(user_id, posts)
+    bump_versions((("timeline", user_id),))
+
+
+@shared_task
+def prune_timeline(user_id: int, author_id: int) -> None:
+    """
+    Remove an unfollowed author's posts from a timeline
+    """
+    get_timeline_backend().prune(user_id, author_id)
+    bump_versions((("timeline", user_id),))
+
+
+@shared_task
+def reconcile_post_counters(batch_size: int = 1000) -> None:
+    """
+    Recount likes and published replies in batches of posts
+    and repair the denormalized counters that drifted
+    """
+    likes = (
+        Post.likes.through.objects.filter(post_id=OuterRef("pk"))
+        .values("post_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    replies = (
+        Post.objects.filter(parent_id=OuterRef("pk"), published=True)
+        .order_by()
+        .values("parent_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+
+    last_id = 0
+    repaired = 0
+
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .annotate(
+                actual_likes=Coalesce(Subquery(likes), 0),
+                actual_replies=Coalesce(Subquery(replies), 0),
+            )
+            .values_list(
+                "pk",
+                "like_count",
+                "reply_count",
+                "actual_likes",
+                "actual_replies",
+            )[:batch_size]
+        )
+
+        if not batch:
+            break
+
+        drifted = [
+            Post(pk=pk, like_count=actual_likes, reply_count=actual_replies)
+            for pk, likes_, replies_, actual_likes, actual_replies in batch
+            if (likes_, replies_) != (actual_likes, actual_replies)
+        ]
+        Post.objects.bulk_update(drifted, ("like_count", "reply_count"))
+        bump_versions(("post", post.pk) for post in drifted)
+
+        repaired += len(drifted)
+        last_id = batch[-1][0]
+
+    if repaired:
+        bump_versions((("posts",),))
+
+    print(f"Post counters reconciled, {repaired} repaired.")
+
+
+TRENDING_WINDOWS = {
+    TrendingTag.Window.HOUR: timedelta(hours=1),
+    TrendingTag.Window.DAY: timedelta(days=1),
+    TrendingTag.Window.WEEK: timedelta(days=7),
+}
+
+
+@shared_task
+def compute_trending_tags() -> None:
+    """
+    Recount the hourly tag usage of the current and previous hour,
+    then rank tags within each window from the hourly counters
+    """
+    now = timezone.now()
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    longest = max(TRENDING_WINDOWS.values())
+
+    for hour in (current_hour - timedelta(hours=1), current_hour):
+        usage = (
+            TaggedPost.objects.filter(
+                created_at__gte=hour,
+                created_at__lt=hour + timedelta(hours=1),
+                content_object__published=True,
+            )
+            .values("tag_id")
+            .annotate(count=Count("pk"))
+            .values_list("tag_id", "count")
+        )
+
+        with transaction.atomic():
+            TagUsage.objects.filter(hour=hour).delete()
+            TagUsage.objects.bulk_create(
+                (
+                    TagUsage(tag_id=tag_id, hour=hour, count=count)
+                    for tag_id, count in usage.iterator()
+                ),
+                batch_size=1000,
+            )
+
+    TagUsage.objects.filter(hour__lt=current_hour - longest).delete()
+
+    for window, length in TRENDING_WINDOWS.items():
+        # The current hour is partial, so windows
+        # also cover the hour before their start
+        ranking = (
+            TagUsage.objects.filter(hour__gte=current_hour - length)
+            .values("tag_id")
+            .annotate(total=Sum("count"))
+            .order_by("-total", "tag_id")
+            .values_list("tag_id", "total")[: settings.TRENDING_TAGS_SIZE]
+        )
+
+        with transaction.atomic():
+            TrendingTag.objects.filter(window=window).delete()
+            TrendingTag.objects.bulk_create(
+                TrendingTag(
+                    window=window,
+                    rank=rank,
+                    tag_id=tag_id,
+                    count=total,
+                    computed_at=now,
+                )
+                for rank, (tag_id, total) in enumerate(ranking, start=1)
+            )
+
+    bump_versions((("trending",),))
+
+    print("Trending tags computed.")
+
+
+@shared_task
+def expire_uploads() -> None:
+    """
+    Delete the uploads and temporary files that were never attached
+    """
+    expired = Upload.objects.filter(
+        created_at__lt=timezone.now() - settings.UPLOAD_EXPIRY
+    )
+
+    count = 0
+    for upload in expired.iterator():
+        upload.delete()
+        count += 1
+
+    print(f"{count} expired uploads deleted.")
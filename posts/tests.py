@@ -1,3 +1,495 @@
-from django.test import TestCase
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from PIL import Image
+from rest_framework.test import APIClient
+
+from config import celery_app
+
+from .async_views import HomeAsyncView
+from .models import Post, PostImage, Upload
+from users.models import ProfileStats
+
+
+def create_user(username: str):
+    return get_user_model().objects.create_user(
+        email=f"{username}@example.com",
+        username=username,
+        password="password123",
+    )
+
+
+def authenticated_client(user) -> APIClient:
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@contextmanager
+def eager_tasks():
+    """Run Celery tasks in the test process as they are sent"""
+    previous = celery_app.conf.task_always_eager
+    celery_app.conf.task_always_eager = True
+
+    try:
+        yield
+    finally:
+        celery_app.conf.task_always_eager = previous
+
+
+@contextmanager
+def temporary_media():
+    """Store media and uploads in a directory removed afterwards"""
+    with tempfile.TemporaryDirectory() as directory:
+        with override_settings(
+            MEDIA_ROOT=directory, UPLOAD_TEMP_DIR=f"{directory}/uploads"
+        ):
+            yield directory
+
+
+def image_bytes(color: str = "red", size=(32, 32)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def publish(client, text: str, **fields) -> int:
+    response = client.post(
+        reverse("posts:post-list"),
+        {"text": text, "tags": [], **fields},
+        format="json",
+    )
+    assert response.status_code == status.HTTP_201_CREATED, response.data
+    return response.data["id"]
+
+
+class PostCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_user("author")
+        self.reader = create_user("reader")
+        self.post = Post.objects.create(user=self.author, text="Hello")
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def rename_author(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(
+            reverse("users:manage-user"), {"username": "renamed"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_author_rename_changes_post_detail(self):
+        url = reverse("posts:post-detail", args=(self.post.id,))
+        etag = self.client.get(url).headers["ETag"]
+
+        self.rename_author()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"]["username"], "renamed")
+
+    def test_author_rename_changes_post_list(self):
+        url = reverse("posts:post-list")
+        etag = self.client.get(url).headers["ETag"]
+
+        self.rename_author()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"][0]["user"]["username"], "renamed"
+        )
+
+
+class HomeAsyncViewTests(TestCase):
+    async def test_anonymous_request_is_rejected(self):
+        request = AsyncRequestFactory().get("/api/posts/home/")
+
+        response = await HomeAsyncView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ScheduledPostTests(TestCase):
+    def setUp(self):
+        self.user = create_user("author")
+        self.publish_at = timezone.now() + timedelta(days=1)
+        self.post = Post.objects.create(
+            user=self.user,
+            text="Later",
+            published=False,
+            publish_at=self.publish_at,
+        )
+        self.url = reverse("posts:scheduled-post-detail", args=(self.post.id,))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reschedule(self):
+        publish_at = self.publish_at + timedelta(hours=1)
+
+        response = self.client.patch(self.url, {"publish_at": publish_at})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.publish_at, publish_at)
+
+    def test_partial_update_without_publish_at(self):
+        response = self.client.patch(self.url, {"text": "Changed"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.publish_at, self.publish_at)
+        self.assertEqual(self.post.text, "Later")
+
+    def test_update_published_post(self):
+        Post.objects.filter(pk=self.post.pk).update(published=True)
+
+        response = self.client.patch(self.url, {"text": "Changed"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(eager_tasks())
+        self.author = create_user("author")
+        self.reader = create_user("reader")
+        self.author_client = authenticated_client(self.author)
+        self.reader_client = authenticated_client(self.reader)
+
+    def follow(self, method="post"):
+        url = reverse("users:profile-follow", args=(self.author.profile.id,))
+        response = getattr(self.reader_client, method)(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def home(self) -> list[str]:
+        response = self.reader_client.get(reverse("posts:post-home"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["text"] for post in response.data["results"]]
+
+    def test_published_post_fans_out_to_followers(self):
+        self.follow()
+        publish(self.author_client, "Hello")
+        publish(self.reader_client, "Mine")
+
+        self.assertEqual(self.home(), ["Mine", "Hello"])
+
+    def test_follow_backfills_recent_posts(self):
+        publish(self.author_client, "Earlier")
+
+        self.follow()
+
+        self.assertEqual(self.home(), ["Earlier"])
+
+    def test_unfollow_prunes_author_posts(self):
+        self.follow()
+        publish(self.author_client, "Hello")
+
+        self.follow("delete")
+
+        self.assertEqual(self.home(), [])
+
+    def test_deleted_post_leaves_timelines(self):
+        self.follow()
+        post_id = publish(self.author_client, "Hello")
+
+        response = self.author_client.delete(
+            reverse("posts:post-detail", args=(post_id,))
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.home(), [])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user("author")
+        self.client = authenticated_client(self.user)
+        self.url = reverse(
+            "users:profile-posts", args=(self.user.profile.id,)
+        )
+
+        for index in range(5):
+            Post.objects.create(user=self.user, text=f"Post {index}")
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    @staticmethod
+    def texts(page) -> list[str]:
+        return [post["text"] for post in page["results"]]
+
+    def test_until_pages_to_older_posts(self):
+        page = self.get(self.url, page_size=2)
+        texts = self.texts(page)
+
+        while page["next"]:
+            page = self.get(page["next"])
+            texts += self.texts(page)
+
+        self.assertEqual(texts, [f"Post {index}" for index in (4, 3, 2, 1, 0)])
+
+    def test_since_returns_newer_posts(self):
+        page = self.get(self.url, page_size=2)
+        Post.objects.create(user=self.user, text="Post 5")
+
+        newer = self.get(page["previous"])
+
+        self.assertEqual(self.texts(newer), ["Post 5"])
+        self.assertEqual(self.texts(self.get(newer["next"]))[0], "Post 4")
+
+    def test_since_without_newer_posts(self):
+        page = self.get(self.url)
+
+        newer = self.get(page["previous"])
+
+        self.assertEqual(self.texts(newer), [])
+        self.assertIsNotNone(newer["previous"])
+
+    def test_invalid_cursor(self):
+        for cursor in ("not-a-cursor", "bm90fGE=", "eHwx"):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {"until": cursor})
+
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
+
+
+class PostCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(eager_tasks())
+        self.author = create_user("author")
+        self.reader = create_user("reader")
+        self.post = Post.objects.create(user=self.author, text="Hello")
+        self.client = authenticated_client(self.reader)
+        self.like_url = reverse("posts:post-like", args=(self.post.id,))
+
+    def counts(self) -> tuple[int, int]:
+        response = self.client.get(
+            reverse("posts:post-detail", args=(self.post.id,))
+        )
+        return response.data["likes"], response.data["replies"]
+
+    def test_like_and_unlike(self):
+        self.assertEqual(
+            self.client.post(self.like_url).status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(self.counts(), (1, 0))
+
+        self.assertEqual(
+            self.client.delete(self.like_url).status_code,
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_repeated_like_and_unlike_are_counted_once(self):
+        self.client.post(self.like_url)
+
+        self.assertEqual(
+            self.client.post(self.like_url).status_code,
+            status.HTTP_204_NO_CONTENT,
+        )
+        self.assertEqual(self.counts(), (1, 0))
+
+        self.client.delete(self.like_url)
+
+        self.assertEqual(
+            self.client.delete(self.like_url).status_code,
+            status.HTTP_204_NO_CONTENT,
+        )
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reply_and_reply_delete(self):
+        response = self.client.post(
+            reverse("posts:post-replies", args=(self.post.id,)),
+            {"text": "Hi", "tags": []},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counts(), (0, 1))
+
+        self.client.delete(
+            reverse("posts:post-detail", args=(response.data["id"],))
+        )
+
+        self.assertEqual(self.counts(), (0, 0))
+
+
+class BatchLikeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_user("author")
+        self.reader = create_user("reader")
+        self.posts = [
+            Post.objects.create(user=self.author, text=f"Post {index}")
+            for index in range(3)
+        ]
+        self.ids = [post.id for post in self.posts]
+        self.client = authenticated_client(self.reader)
+        self.url = reverse("posts:post-likes")
+
+    def like_counts(self) -> list[int]:
+        return list(
+            Post.objects.filter(pk__in=self.ids)
+            .order_by("pk")
+            .values_list("like_count", flat=True)
+        )
+
+    def likes_received(self) -> int:
+        return ProfileStats.objects.get(
+            profile__user=self.author
+        ).likes_received_count
+
+    def test_batch_like_and_unlike(self):
+        response = self.client.post(
+            self.url, {"like": [*self.ids, 999_999]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, [{"id": pk, "liked": True} for pk in self.ids]
+        )
+        self.assertEqual(self.like_counts(), [1, 1, 1])
+        self.assertEqual(self.likes_received(), 3)
+
+        self.client.post(
+            self.url,
+            {"like": self.ids[:1], "unlike": self.ids[1:]},
+            format="json",
+        )
+
+        self.assertEqual(self.like_counts(), [1, 0, 0])
+        self.assertEqual(self.likes_received(), 1)
+
+    def test_like_states(self):
+        self.client.post(self.url, {"like": self.ids[:1]}, format="json")
+
+        response = self.client.get(
+            self.url, {"ids": ",".join(map(str, self.ids))}
+        )
+
+        self.assertCountEqual(
+            response.data,
+            [
+                {"id": pk, "liked": pk == self.ids[0]}
+                for pk in self.ids
+            ],
+        )
+
+    def test_batch_like_uses_one_update_per_direction(self):
+        self.client.post(self.url, {"like": self.ids[2:]}, format="json")
+
+        # Changes of likes, then of the likes received by the author
+        with self.assertNumQueries(7):
+            self.client.post(
+                self.url,
+                {"like": self.ids[:2], "unlike": self.ids[2:]},
+                format="json",
+            )
+
+
+class UploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(eager_tasks())
+        self.enterContext(temporary_media())
+        self.user = create_user("uploader")
+        self.client = authenticated_client(self.user)
+        self.content = image_bytes()
+
+    def create_upload(self) -> str:
+        response = self.client.post(
+            reverse("posts:upload-list"),
+            {"filename": "photo.png", "size": len(self.content)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def send(self, upload_id, start: int, end: int):
+        return self.client.put(
+            reverse("posts:upload-detail", args=(upload_id,)),
+            self.content[start:end],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end - 1}/{len(self.content)}",
+        )
+
+    def finalize(self, upload_id):
+        return self.client.post(
+            reverse("posts:upload-finalize", args=(upload_id,))
+        )
+
+    def test_chunks_are_written_at_the_offset(self):
+        upload_id = self.create_upload()
+        middle = len(self.content) // 2
+
+        response = self.send(upload_id, 0, middle)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["offset"], middle)
+
+        response = self.send(upload_id, middle, len(self.content))
+
+        self.assertEqual(response.data["offset"], len(self.content))
+        with open(Upload.objects.get(pk=upload_id).path, "rb") as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_chunk_off_the_offset_conflicts(self):
+        upload_id = self.create_upload()
+        self.send(upload_id, 0, 10)
+
+        for start in (0, 20):
+            response = self.send(upload_id, start, start + 10)
+
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual(response.data["offset"], 10)
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        upload_id = self.create_upload()
+        self.send(upload_id, 0, 10)
+
+        response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalized_upload_is_attached_to_post(self):
+        upload_id = self.create_upload()
+        self.send(upload_id, 0, len(self.content))
+
+        response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], Upload.Status.COMPLETE)
+
+        post_id = publish(self.client, "Photo", uploads=[upload_id])
+        post_image = PostImage.objects.get(post_id=post_id)
+
+        self.assertFalse(Upload.objects.filter(pk=upload_id).exists())
+        with post_image.image.open("rb") as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_upload_that_is_not_an_image_is_discarded(self):
+        self.content = b"not an image".ljust(64, b"!")
+        upload_id = self.create_upload()
+        self.send(upload_id, 0, len(self.content))
+
+        response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Upload.objects.filter(pk=upload_id).exists())
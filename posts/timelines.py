@@ -0,0 +1,209 @@
+"""
+Materialized home timelines.
+
+Publishing a post pushes it into the timelines of its author and their
+followers, so reading the home feed is a range read over one user's
+entries instead of a join across the follow graph.
+
+Entries are ordered by the `(created_at, post_id)` key of their post.
+`settings.TIMELINE_BACKEND` selects where they are stored.
+"""
+import functools
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from core.redis import get_redis
+from .models import Post, TimelineEntry
+
+
+class BaseTimelineBackend:
+    def push(self, post: Post, user_ids) -> None:
+        """Add a post to the timelines of the given users"""
+        raise NotImplementedError
+
+    def backfill(self, user_id: int, posts) -> None:
+        """Add several posts to a single timeline"""
+        raise NotImplementedError
+
+    def prune(self, user_id: int, author_id: int) -> None:
+        """Remove an author's posts from a timeline"""
+        raise NotImplementedError
+
+    def fetch(
+        self,
+        user_id: int,
+        limit: int,
+        since: tuple = None,
+        until: tuple = None,
+    ) -> list[int]:
+        """
+        Return up to `limit` post ids from a timeline.
+
+        `since` and `until` are exclusive `(created_at, post_id)` bounds.
+        With `since`, the posts right after the bound are returned in
+        ascending order, otherwise posts are returned newest first.
+        """
+        raise NotImplementedError
+
+
+class DatabaseTimelineBackend(BaseTimelineBackend):
+    batch_size = 1000
+
+    def _create(self, entries) -> None:
+        TimelineEntry.objects.bulk_create(
+            entries,
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+    def push(self, post, user_ids):
+        self._create(
+            TimelineEntry(
+                owner_id=user_id,
+                post_id=post.id,
+                author_id=post.user_id,
+                created_at=post.created_at,
+            )
+            for user_id in user_ids
+        )
+
+    def backfill(self, user_id, posts):
+        self._create(
+            TimelineEntry(
+                owner_id=user_id,
+                post_id=post.id,
+                author_id=post.user_id,
+                created_at=post.created_at,
+            )
+            for post in posts
+        )
+
+    def prune(self, user_id, author_id):
+        TimelineEntry.objects.filter(
+            owner_id=user_id,
+            author_id=author_id,
+        ).delete()
+
+    def fetch(self, user_id, limit, since=None, until=None):
+        entries = TimelineEntry.objects.filter(owner_id=user_id)
+
+        if since:
+            created_at, post_id = since
+            entries = entries.filter(
+                Q(created_at__gt=created_at)
+                | Q(created_at=created_at, post_id__gt=post_id)
+            ).order_by("created_at", "post_id")
+
+        if until:
+            created_at, post_id = until
+            entries = entries.filter(
+                Q(created_at__lt=created_at)
+                | Q(created_at=created_at, post_id__lt=post_id)
+            )
+
+        return list(entries.values_list("post_id", flat=True)[:limit])
+
+
+class RedisTimelineBackend(BaseTimelineBackend):
+    """
+    Keep each timeline in a sorted set scored by the post's creation time
+    in microseconds, trimmed to `settings.TIMELINE_MAX_LENGTH` entries
+    """
+
+    key_prefix = "timeline"
+    # Extra members read past the page so that posts sharing the bound's
+    # score can be filtered on their id without shortening the page
+    tie_allowance = 32
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self.max_length = settings.TIMELINE_MAX_LENGTH
+
+    def key(self, user_id: int) -> str:
+        return f"{self.key_prefix}:{user_id}"
+
+    @staticmethod
+    def score(created_at) -> int:
+        return int(created_at.timestamp() * 1_000_000)
+
+    def _trim(self, pipeline, key: str) -> None:
+        pipeline.zremrangebyrank(key, 0, -(self.max_length + 1))
+
+    def push(self, post, user_ids):
+        score = self.score(post.created_at)
+        pipeline = self.client.pipeline()
+
+        for user_id in user_ids:
+            key = self.key(user_id)
+            pipeline.zadd(key, {post.id: score})
+            self._trim(pipeline, key)
+
+        pipeline.execute()
+
+    def backfill(self, user_id, posts):
+        mapping = {post.id: self.score(post.created_at) for post in posts}
+
+        if not mapping:
+            return
+
+        key = self.key(user_id)
+        pipeline = self.client.pipeline()
+        pipeline.zadd(key, mapping)
+        self._trim(pipeline, key)
+        pipeline.execute()
+
+    def prune(self, user_id, author_id):
+        post_ids = list(
+            Post.objects.filter(user_id=author_id)
+            .order_by("-created_at")
+            .values_list("id", flat=True)[: self.max_length]
+        )
+
+        if post_ids:
+            self.client.zrem(self.key(user_id), *post_ids)
+
+    def fetch(self, user_id, limit, since=None, until=None):
+        key = self.key(user_id)
+
+        # Score bounds are inclusive and the post id settles ties
+        count = limit + self.tie_allowance
+
+        if since:
+            bound = (self.score(since[0]), since[1])
+            members = self.client.zrangebyscore(
+                key, bound[0], "+inf", start=0, num=count,
+                withscores=True,
+            )
+            entries = sorted(
+                entry
+                for entry in self._parse(members)
+                if entry > bound
+            )
+        else:
+            high = "+inf"
+
+            if until:
+                bound = (self.score(until[0]), until[1])
+                high = bound[0]
+
+            members = self.client.zrevrangebyscore(
+                key, high, "-inf", start=0, num=count,
+                withscores=True,
+            )
+            entries = sorted(self._parse(members), reverse=True)
+
+            if until:
+                entries = [entry for entry in entries if entry < bound]
+
+        return [post_id for _, post_id in entries[:limit]]
+
+    @staticmethod
+    def _parse(members):
+        return ((int(score), int(member)) for member, score in members)
+
+
+@functools.lru_cache(maxsize=None)
+def get_timeline_backend() -> BaseTimelineBackend:
+    return import_string(settings.TIMELINE_BACKEND)()
@@ -0,0 +1,136 @@
+"""
+Resumable chunked uploads of post images.
+
+A client creates an upload with the file's name and size, then sends the
+file in one or more `PUT` requests carrying a `Content-Range` header.
+Each chunk is copied from the request stream to a temporary file in small
+blocks, so neither the chunk nor the file is held in memory. After an
+interruption the client reads the upload's `offset` and resumes from it.
+Finalizing checks that the file is a complete image, after which its id
+can be passed in `uploads` when creating a post.
+"""
+import os
+import re
+
+from django.core.files import File
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import PostImage, Upload
+
+
+BLOCK_SIZE = 64 * 1024
+
+content_range_pattern = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class OffsetConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_code = "offset_conflict"
+
+    def __init__(self, offset: int):
+        super().__init__(
+            {"detail": "Chunk does not start at the upload offset"}
+        )
+        # Kept as a number for clients resuming from it
+        self.detail["offset"] = offset
+
+
+def parse_content_range(header: str, upload: Upload) -> tuple[int, int]:
+    """Return the start and length of the chunk described by the header"""
+    match = content_range_pattern.match(header.strip())
+
+    if match is None:
+        raise ValidationError(
+            {"Content-Range": "Expected 'bytes <start>-<end>/<size>'"}
+        )
+
+    start, end, size = map(int, match.groups())
+
+    if size != upload.size or not start <= end < size:
+        raise ValidationError(
+            {"Content-Range": "Range does not fit the upload size"}
+        )
+
+    return start, end - start + 1
+
+
+def write_chunk(upload: Upload, stream, start: int, length: int) -> int:
+    """
+    Copy `length` bytes from `stream` into the upload's file at `start`
+    and return the new offset
+    """
+    if upload.status != Upload.Status.PENDING:
+        raise ValidationError("Upload is already finalized")
+
+    if start != upload.offset:
+        raise OffsetConflict(upload.offset)
+
+    os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+    descriptor = os.open(upload.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    with os.fdopen(descriptor, "r+b") as file:
+        # Drop the bytes of a chunk that was interrupted
+        file.truncate(start)
+        file.seek(start)
+        remaining = length
+
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining)) if stream else b""
+
+            if not block:
+                break
+
+            file.write(block)
+            remaining -= len(block)
+
+        if remaining:
+            file.truncate(start)
+            raise ValidationError("Request body is shorter than the range")
+
+    offset = start + length
+    updated = Upload.objects.filter(
+        pk=upload.pk,
+        offset=start,
+        status=Upload.Status.PENDING,
+    ).update(offset=offset)
+
+    if not updated:
+        upload.refresh_from_db(fields=("offset",))
+        raise OffsetConflict(upload.offset)
+
+    upload.offset = offset
+    return offset
+
+
+def finalize(upload: Upload) -> None:
+    """Check that a fully received upload is an image and complete it"""
+    if upload.status == Upload.Status.COMPLETE:
+        return
+
+    if upload.offset != upload.size:
+        raise ValidationError(
+            f"Upload is incomplete: {upload.offset} of {upload.size} bytes"
+        )
+
+    try:
+        with Image.open(upload.path) as image:
+            image.verify()
+    except Exception:
+        upload.delete()
+        raise ValidationError("Upload is not a valid image")
+
+    upload.status = Upload.Status.COMPLETE
+    upload.save(update_fields=("status",))
+
+
+def attach(upload: Upload, post) -> PostImage:
+    """Store a completed upload as an image of a post"""
+    post_image = PostImage(post=post)
+
+    with open(upload.path, "rb") as file:
+        post_image.image.save(upload.filename, File(file))
+
+    upload.delete()
+    return post_image
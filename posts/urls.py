@@ -1,12 +1,43 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework import routers
 
-from posts.views import PostViewSet
+from posts.async_views import (
+    HomeAsyncView,
+    PostDetailAsyncView,
+    PostListAsyncView,
+    PostStreamView,
+)
+from posts.views import (
+    PostViewSet,
+    ScheduledPostViewSet,
+    TrendingTagListView,
+    UploadViewSet,
+)
 
 
 router = routers.DefaultRouter()
+router.register("scheduled", ScheduledPostViewSet, basename="scheduled-post")
+router.register("uploads", UploadViewSet, basename="upload")
 router.register("", PostViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path(
+        "tags/trending/",
+        TrendingTagListView.as_view(),
+        name="trending-tags",
+    ),
+] + router.urls
+
+if settings.ASYNC_READS:
+    # Matched before the router's routes of the same names
+    urlpatterns = [
+        path("", PostListAsyncView.as_view(), name="post-list"),
+        path("home/", HomeAsyncView.as_view(), name="post-home"),
+        path("stream/", PostStreamView.as_view(), name="post-stream"),
+        path(
+            "<int:pk>/", PostDetailAsyncView.as_view(), name="post-detail"
+        ),
+    ] + urlpatterns
 
 app_name = "posts"
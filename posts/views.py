@@ -1,53 +1,131 @@
-from django.db.models import Q
+import functools
+from collections import Counter, defaultdict
+
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
-from rest_framework import status, viewsets, filters
+from rest_framework import generics, mixins, status, viewsets
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from django_filters.rest_framework import DjangoFilterBackend
+from taggit.models import Tag
 from drf_spectacular.utils import (
     extend_schema,
     OpenApiParameter,
 )
 
-from .models import Post
+from . import uploads
+from .models import Post, TaggedPost, TrendingTag, Upload
 from .permissions import IsAuthor
-from .tasks import defer_post
+from .search import PostSearchFilter
+from .signals import post_published
+from .timelines import get_timeline_backend
 from .serializers import (
+    LikeBatchSerializer,
+    LikeStateSerializer,
     PostCreateSerializer,
     PostListSerializer,
     PostRetrieveSerializer,
     PostSerializer,
+    ScheduledPostSerializer,
+    TrendingTagSerializer,
+    UploadSerializer,
 )
-from core.pagination import StandardResultSetPagination
-from core.serializers import EmptySerializer
+from core.cache import cached_response, conditional_response
+from core.routers import ReplicaReadMixin
+from core.pagination import KeysetPagination, StandardResultSetPagination
+from core.serializers import EmptySerializer, IdsQuerySerializer
+from users.models import ProfileStats
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Post.objects.filter(published=True)
     serializer_class = PostSerializer
     permission_classes = (AllowAny,)
-    pagination_class = StandardResultSetPagination
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    pagination_class = KeysetPagination
+    filter_backends = (DjangoFilterBackend, PostSearchFilter)
     filterset_fields = ("user",)
-    search_fields = ("text",)
 
     def get_queryset(self):
         queryset = self.queryset
+        params = self.request.query_params
+
+        tags_all = params.get("tags_all")
+        tags_any = params.get("tags_any") or params.get("tags")
 
-        tags = self.request.query_params.get("tags")
+        if tags_all:
+            queryset = self.filter_tags(queryset, tags_all, match_all=True)
 
-        if tags:
-            tags = tags.split(",")
-            queryset = queryset.filter(tags__name__in=tags)
+        if tags_any:
+            queryset = self.filter_tags(queryset, tags_any)
 
         if self.action in ("list", "retrieve", "home"):
             queryset = queryset.select_related(
                 "user__profile"
-            ).prefetch_related("images", "tags", "likes")
+            ).prefetch_related("images", "tags")
+
+        return queryset.defer("search_vector")
+
+    @staticmethod
+    def tag_names(tags: str) -> set[str]:
+        return {name.strip() for name in tags.split(",") if name.strip()}
+
+    @classmethod
+    def filter_tags(cls, queryset, tags: str, match_all: bool = False):
+        """
+        Keep posts tagged with all or any of the comma-separated tags
+        """
+        names = cls.tag_names(tags)
+        tag_ids = list(
+            Tag.objects.filter(name__in=names).values_list("id", flat=True)
+        )
+
+        return cls.filter_tag_ids(queryset, names, tag_ids, match_all)
+
+    @staticmethod
+    def filter_tag_ids(queryset, names, tag_ids, match_all: bool = False):
+        """
+        Keep posts tagged with all or any of the tags with the given ids.
+        Each condition is a semi-join on the indexed `TaggedPost` table,
+        so no DISTINCT is needed.
+        """
+        if not tag_ids or (match_all and len(tag_ids) < len(names)):
+            return queryset.none()
+
+        tagged = TaggedPost.objects.filter(content_object=OuterRef("pk"))
+
+        if not match_all:
+            return queryset.filter(Exists(tagged.filter(tag_id__in=tag_ids)))
+
+        for tag_id in tag_ids:
+            queryset = queryset.filter(Exists(tagged.filter(tag_id=tag_id)))
+
+        return queryset
+
+    @property
+    def paginator(self):
+        """
+        Search results are ordered by relevance rather than recency,
+        so they are paged by number instead of by keyset
+        """
+        if not hasattr(self, "_paginator") and (
+            self.action == "list" and self.request.query_params.get("search")
+        ):
+            self._paginator = StandardResultSetPagination()
+
+        return super().paginator
+
+    @property
+    def throttle_scope(self):
+        if self.action == "home":
+            return "home"
 
-        return queryset.distinct()
+        if self.action == "list" and self.request.query_params.get("search"):
+            return "search"
+
+        return None
 
     def get_serializer_class(self):
         if self.action in ("list", "home", "liked", "replies"):
@@ -59,11 +137,25 @@ class PostViewSet(viewsets.ModelViewSet):
         if self.action == "like":
             return EmptySerializer
 
+        if self.action == "batch_like":
+            return LikeBatchSerializer
+
         if self.action in ("create", "add_reply"):
             return PostCreateSerializer
 
         return PostSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a post
+        """
+        return cached_response(
+            request,
+            "post",
+            (("post", kwargs["pk"]), ("profiles",)),
+            functools.partial(super().retrieve, request, *args, **kwargs),
+        )
+
     def get_permissions(self):
         if self.action in (
             "create",
@@ -71,6 +163,8 @@ class PostViewSet(viewsets.ModelViewSet):
             "like",
             "unlike",
             "liked",
+            "likes",
+            "batch_like",
             "add_reply",
         ):
             return (IsAuthenticated(),)
@@ -84,18 +178,25 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        self.perform_create(serializer, **self.schedule(serializer))
+
+        headers = self.get_success_headers(serializer.data)
+        return Response(
+            serializer.data, status=status.HTTP_201_CREATED, headers=headers
+        )
+
+    @staticmethod
+    def schedule(serializer) -> dict:
+        """
+        Fields keeping a post with a future `publish_at` unpublished
+        until `publish_scheduled_posts` picks it up
+        """
         publish_at = serializer.validated_data.pop("publish_at", None)
-        if publish_at and publish_at > timezone.now():
-            post = self.perform_create(serializer, published=False)
-            defer_post.apply_async((post.id,), eta=publish_at)
-        else:
-            self.perform_create(serializer)
 
-        data = serializer.data
-        data["publish_at"] = publish_at
+        if publish_at and publish_at > timezone.now():
+            return {"published": False, "publish_at": publish_at}
 
-        headers = self.get_success_headers(serializer.data)
-        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+        return {}
 
     @action(
         methods=["GET"],
@@ -108,13 +209,26 @@ class PostViewSet(viewsets.ModelViewSet):
         Retrieve posts created by the current user
         or the users they are following
         """
-        posts = self.get_queryset().filter(
-            Q(user=request.user)
-            | Q(user__profile__followers=request.user.profile)
-        )
-        serializer = self.get_serializer(posts, many=True)
+        backend = get_timeline_backend()
+        queryset = self.get_queryset()
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def fetch(limit, since, until):
+            post_ids = backend.fetch(request.user.id, limit, since, until)
+            posts = queryset.in_bulk(post_ids)
+            return [posts[pk] for pk in post_ids if pk in posts]
+
+        def build():
+            page = self.paginator.paginate_fetch(fetch, request)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return conditional_response(
+            request,
+            "home",
+            (("timeline", request.user.id), ("posts",)),
+            build,
+            request.get_full_path(),
+        )
 
     @action(
         methods=["POST"],
@@ -126,11 +240,10 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         Like a post
         """
-        user = request.user
         post = self.get_object()
 
-        if user not in post.likes.all():
-            post.likes.add(user)
+        if Post.add_likes(request.user.id, (post.id,)):
+            self.count_likes((post,), 1)
             return Response(
                 {}, status=status.HTTP_200_OK
             )
@@ -142,17 +255,100 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         Unlike a post
         """
-        user = request.user
         post = self.get_object()
 
-        if user in post.likes.all():
-            post.likes.remove(user)
+        if Post.remove_likes(request.user.id, (post.id,)):
+            self.count_likes((post,), -1)
             return Response(
                 {}, status=status.HTTP_200_OK
             )
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def count_likes(posts, delta: int) -> None:
+        """Apply a change of likes to the posts and their authors"""
+        Post.change_like_counts((post.id for post in posts), delta)
+
+        # Authors are grouped by their change, mostly a single group
+        authors = Counter(post.user_id for post in posts if post.user_id)
+        changes = defaultdict(list)
+
+        for user_id, count in authors.items():
+            changes[count * delta].append(user_id)
+
+        for change, user_ids in changes.items():
+            ProfileStats.change_many("likes_received_count", change, user_ids)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                type={"type": "list", "items": {"type": "integer"}},
+                description="Comma-separated post ids, at most 100",
+                required=True,
+            ),
+        ],
+        responses=LikeStateSerializer(many=True),
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="likes",
+        permission_classes=[IsAuthenticated],
+    )
+    def likes(self, request) -> Response:
+        """
+        Retrieve whether the current user likes each of the posts
+        """
+        query = IdsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        post_ids = query.validated_data["ids"]
+
+        liked = Post.likes.through.objects.filter(
+            post_id=OuterRef("pk"), user_id=request.user.id
+        )
+        states = (
+            Post.objects.filter(pk__in=post_ids, published=True)
+            .annotate(liked=Exists(liked))
+            .values("id", "liked")
+        )
+
+        return Response(LikeStateSerializer(states, many=True).data)
+
+    @extend_schema(responses=LikeStateSerializer(many=True))
+    @likes.mapping.post
+    def batch_like(self, request) -> Response:
+        """
+        Like and unlike many posts at once
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        like = serializer.validated_data.get("like", [])
+        unlike = serializer.validated_data.get("unlike", [])
+
+        posts = Post.objects.filter(
+            pk__in=[*like, *unlike], published=True
+        ).only("id", "user_id")
+        posts = {post.id: post for post in posts}
+
+        added = Post.add_likes(
+            request.user.id, [pk for pk in like if pk in posts]
+        )
+        removed = Post.remove_likes(
+            request.user.id, [pk for pk in unlike if pk in posts]
+        )
+        self.count_likes([posts[pk] for pk in added], 1)
+        self.count_likes([posts[pk] for pk in removed], -1)
+
+        states = [
+            {"id": pk, "liked": pk in like}
+            for pk in dict.fromkeys((*like, *unlike))
+            if pk in posts
+        ]
+
+        return Response(LikeStateSerializer(states, many=True).data)
+
     @action(
         methods=["GET"],
         detail=False,
@@ -164,9 +360,19 @@ class PostViewSet(viewsets.ModelViewSet):
         Retrieve posts liked by the current user
         """
         posts = self.get_queryset().filter(likes__id=request.user.id)
-        serializer = self.get_serializer(posts, many=True)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build():
+            page = self.paginate_queryset(posts)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return conditional_response(
+            request,
+            "liked",
+            (("posts",),),
+            build,
+            (request.user.id, request.get_full_path()),
+        )
 
     @action(
         methods=["GET"],
@@ -178,11 +384,16 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         Retrieve replies
         """
-        parent = self.get_object()
-        replies = self.get_queryset().filter(parent=parent)
-        serializer = self.get_serializer(replies, many=True)
-
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build():
+            parent = self.get_object()
+            replies = self.get_queryset().filter(parent=parent)
+            page = self.paginate_queryset(replies)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return conditional_response(
+            request, "replies", (("posts",),), build, request.get_full_path()
+        )
 
     @replies.mapping.post
     def add_reply(self, request, pk=None) -> Response:
@@ -194,24 +405,19 @@ class PostViewSet(viewsets.ModelViewSet):
 
         serializer.is_valid(raise_exception=True)
 
-        publish_at = serializer.validated_data.pop("publish_at", None)
-        if publish_at:
-            post = self.perform_create(
-                serializer,
-                published=False,
-                parent=parent,
-            )
-            defer_post.apply_async((post.id,), eta=publish_at)
-        else:
-            self.perform_create(serializer, parent=parent)
-
-        data = serializer.data
-        data["publish_at"] = publish_at
+        self.perform_create(
+            serializer, parent=parent, **self.schedule(serializer)
+        )
 
-        return Response(data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     def perform_create(self, serializer, **kwargs):
-        return serializer.save(user=self.request.user, **kwargs)
+        post = serializer.save(user=self.request.user, **kwargs)
+
+        if post.published:
+            post_published.send(sender=Post, post=post)
+
+        return post
 
     @extend_schema(
         parameters=[
@@ -220,10 +426,20 @@ class PostViewSet(viewsets.ModelViewSet):
                 type=str,
                 description="Search by text",
             ),
+            OpenApiParameter(
+                "tags_all",
+                type={"type": "list", "items": {"type": "string"}},
+                description="Filter by posts having all of the tags",
+            ),
+            OpenApiParameter(
+                "tags_any",
+                type={"type": "list", "items": {"type": "string"}},
+                description="Filter by posts having any of the tags",
+            ),
             OpenApiParameter(
                 "tags",
                 type={"type": "list", "items": {"type": "string"}},
-                description="Filter by tags",
+                description="Filter by tags, same as tags_any",
             ),
             OpenApiParameter(
                 "user",
@@ -236,4 +452,176 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         List all posts
         """
-        return super().list(request, *args, **kwargs)
+        build = functools.partial(super().list, request, *args, **kwargs)
+        params = request.query_params
+
+        if any(param in params for param in ("since", "until", "search")):
+            return conditional_response(
+                request, "posts", (("posts",),), build, request.get_full_path()
+            )
+
+        return cached_response(request, "posts", (("posts",),), build)
+
+
+class ScheduledPostViewSet(
+    ReplicaReadMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Posts of the current user waiting for their `publish_at`.
+    Updating reschedules a post and deleting cancels it.
+    """
+
+    serializer_class = ScheduledPostSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = StandardResultSetPagination
+    http_method_names = ("get", "patch", "delete", "head", "options")
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Post.objects.none()
+
+        return (
+            Post.objects.filter(user=self.request.user, published=False)
+            .prefetch_related("images", "tags")
+            .order_by("publish_at", "id")
+            .defer("search_vector")
+        )
+
+    # Both writes are conditional, so a post published
+    # by the sweeper in the meantime is left untouched
+    def perform_update(self, serializer):
+        post = serializer.instance
+        publish_at = serializer.validated_data.get(
+            "publish_at", post.publish_at
+        )
+
+        updated = Post.objects.filter(pk=post.pk, published=False).update(
+            publish_at=publish_at
+        )
+
+        if not updated:
+            raise NotFound("Post is already published")
+
+        post.publish_at = publish_at
+
+    def perform_destroy(self, instance):
+        deleted, _ = Post.objects.filter(
+            pk=instance.pk, published=False
+        ).delete()
+
+        if not deleted:
+            raise NotFound("Post is already published")
+
+
+class TrendingTagListView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    List the most used tags within a time window
+    """
+
+    serializer_class = TrendingTagSerializer
+    permission_classes = (AllowAny,)
+
+    def get_queryset(self):
+        window = self.request.query_params.get(
+            "window", TrendingTag.Window.DAY
+        )
+
+        if window not in TrendingTag.Window.values:
+            raise ValidationError(
+                {"window": f"Must be one of {TrendingTag.Window.values}"}
+            )
+
+        return TrendingTag.objects.filter(window=window).select_related(
+            "tag"
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "window",
+                type=str,
+                enum=TrendingTag.Window.values,
+                description="Time window, 24h by default",
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            "trending",
+            (("trending",),),
+            functools.partial(super().get, request, *args, **kwargs),
+            request.get_full_path(),
+        )
+
+
+class UploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Resumable chunked uploads of post images
+    """
+
+    serializer_class = UploadSerializer
+    permission_classes = (IsAuthenticated,)
+
+    @property
+    def throttle_scope(self):
+        # Chunks are sent under the user rate
+        if self.action in ("create", "finalize"):
+            return "uploads"
+
+        return None
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Upload.objects.none()
+
+        return Upload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @extend_schema(
+        request={"application/octet-stream": bytes},
+        parameters=[
+            OpenApiParameter(
+                "Content-Range",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                required=True,
+                description="Chunk range, as in 'bytes 0-1048575/5000000'",
+            ),
+        ],
+    )
+    def update(self, request, *args, **kwargs):
+        """
+        Write a chunk of the file at the upload offset
+        """
+        upload = self.get_object()
+        start, length = uploads.parse_content_range(
+            request.headers.get("Content-Range", ""), upload
+        )
+        # The body is read from the stream, never through `request.data`
+        uploads.write_chunk(upload, request.stream, start, length)
+
+        return Response(self.get_serializer(upload).data)
+
+    @extend_schema(request=None)
+    @action(methods=["POST"], detail=True, url_path="finalize")
+    def finalize(self, request, pk=None) -> Response:
+        """
+        Complete an upload once every chunk has been written
+        """
+        upload = self.get_object()
+        uploads.finalize(upload)
+
+        return Response(self.get_serializer(upload).data)
@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.contrib.auth.models import Group
 from django.utils.translation import gettext as _
 
-from .models import Profile, User
+from .models import Profile, ProfileStats, User
 
 
 class ProfileInline(admin.StackedInline):
@@ -52,4 +52,5 @@ class UserAdmin(DjangoUserAdmin):
 
 
 admin.site.register(Profile)
+admin.site.register(ProfileStats)
 admin.site.unregister(Group)
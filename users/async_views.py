@@ -0,0 +1,36 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .serializers import ProfileRetrieveSerializer
+from .views import ProfileDetailView, aget_profile_owner
+from core.async_views import AsyncReadView
+from core.cache import acached_response
+
+
+class ProfileDetailAsyncView(AsyncReadView):
+    """
+    Retrieve user profile
+    """
+
+    fallback = ProfileDetailView.as_view()
+
+    async def get(self, request, pk, *args, **kwargs):
+        async def build():
+            profile = await ProfileDetailView.queryset.filter(pk=pk).afirst()
+
+            if profile is None:
+                raise NotFound()
+
+            serializer = ProfileRetrieveSerializer(
+                profile, context=self.get_serializer_context(request)
+            )
+            return Response(serializer.data)
+
+        user_id = await aget_profile_owner(pk)
+
+        if user_id is None:
+            raise NotFound()
+
+        return await acached_response(
+            request, "profile", (("profile", user_id),), build
+        )
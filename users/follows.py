@@ -0,0 +1,99 @@
+"""
+Follow edges between profiles.
+
+Edges are written with single conditional statements on the follow table
+rather than through `Profile.followers`, so no follower list is loaded
+and profile rows are left untouched. Counters and timelines are only
+updated for the edges that actually changed.
+"""
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Follow, Profile, ProfileStats
+from core.db import add_edges, remove_edges
+from posts.tasks import backfill_timeline, prune_timeline
+
+
+def _owners(profile: Profile, profile_ids) -> dict[int, int]:
+    """Map the other existing profiles among `profile_ids` to their users"""
+    return dict(
+        Profile.objects.filter(pk__in=profile_ids)
+        .exclude(pk=profile.pk)
+        .values_list("pk", "user_id")
+    )
+
+
+def _count(profile: Profile, user_ids: list[int], delta: int) -> None:
+    ProfileStats.change_many("follower_count", delta, user_ids)
+
+    if user_ids:
+        ProfileStats.change(
+            "following_count", delta * len(user_ids), user_id=profile.user_id
+        )
+
+
+def follow(profile: Profile, profile_ids) -> list[int]:
+    """
+    Make a profile follow other profiles,
+    returning the ids of those it did not follow yet
+    """
+    owners = _owners(profile, profile_ids)
+    followed = add_edges(
+        Follow,
+        "follower",
+        profile.pk,
+        "profile",
+        owners,
+        created_at=timezone.now(),
+    )
+    user_ids = [owners[pk] for pk in followed]
+
+    _count(profile, user_ids, 1)
+
+    for user_id in user_ids:
+        backfill_timeline.delay(profile.user_id, user_id)
+
+    return followed
+
+
+def unfollow(profile: Profile, profile_ids) -> list[int]:
+    """
+    Make a profile stop following other profiles,
+    returning the ids of those it followed
+    """
+    owners = _owners(profile, profile_ids)
+    unfollowed = remove_edges(
+        Follow, "follower", profile.pk, "profile", owners
+    )
+    user_ids = [owners[pk] for pk in unfollowed]
+
+    _count(profile, user_ids, -1)
+
+    for user_id in user_ids:
+        prune_timeline.delay(profile.user_id, user_id)
+
+    return unfollowed
+
+
+def relationships(profile: Profile, profile_ids) -> list[dict]:
+    """
+    Return whether a profile follows and is followed by
+    each existing profile among `profile_ids`, in one query
+    """
+    return list(
+        Profile.objects.filter(pk__in=profile_ids)
+        .annotate(
+            is_following=Exists(
+                Follow.objects.filter(
+                    profile=OuterRef("pk"), follower=profile.pk
+                )
+            ),
+            is_followed_by=Exists(
+                Follow.objects.filter(
+                    profile=profile.pk, follower=OuterRef("pk")
+                )
+            ),
+        )
+        .order_by("pk")
+        .values("id", "is_following", "is_followed_by")
+    )
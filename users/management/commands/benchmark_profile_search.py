@@ -0,0 +1,128 @@
+import random
+import statistics
+import string
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import connection
+
+from users.models import Profile
+from users.search import get_profile_search_backend
+
+
+User = get_user_model()
+
+PREFIX = "bench_"
+WORDS = (
+    "coffee", "travel", "music", "photography", "football", "design",
+    "cats", "books", "running", "cooking", "gaming", "python", "art",
+)
+COUNTRIES = ("UA", "PL", "DE", "US", "GB", "FR", "ES", "IT")
+
+
+def random_username(rng: random.Random) -> str:
+    letters = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+    return f"{PREFIX}{letters}{rng.randint(0, 10 ** 6)}"
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the latency of fetching the first page
+    of profile search results as the profile table grows.
+    Synthetic profiles are removed afterwards unless `--keep` is passed.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=(10_000, 100_000, 1_000_000),
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--keep", action="store_true")
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(42)
+        backend = get_profile_search_backend()
+        self.stdout.write(f"Backend: {type(backend).__name__}")
+        self.stdout.write(
+            f"{'profiles':>10} {'query':>24} {'p50 ms':>8} {'p95 ms':>8}"
+        )
+
+        try:
+            for size in sorted(kwargs["sizes"]):
+                self.populate(size, rng, kwargs["batch_size"])
+
+                for query in self.queries():
+                    timings = self.measure(backend, query, kwargs["repeat"])
+                    label = ",".join(f"{k}={v}" for k, v in query.items())
+                    self.stdout.write(
+                        f"{size:>10} {label:>24} "
+                        f"{statistics.median(timings):>8.2f} "
+                        f"{statistics.quantiles(timings, n=20)[-1]:>8.2f}"
+                    )
+        finally:
+            if not kwargs["keep"]:
+                User.objects.filter(username__startswith=PREFIX).delete()
+
+    @staticmethod
+    def queries():
+        return (
+            {"username": "mari"},
+            {"bio": "photography"},
+            {"username": "alex", "bio": "coffee"},
+        )
+
+    def populate(self, size: int, rng: random.Random, batch_size: int):
+        """Top the profile table up to `size` rows, bypassing signals"""
+        missing = size - Profile.objects.count()
+
+        while missing > 0:
+            count = min(batch_size, missing)
+            usernames = [random_username(rng) for _ in range(count)]
+            User.objects.bulk_create(
+                (
+                    User(
+                        username=username,
+                        email=f"{username}@example.com",
+                        password="!",
+                    )
+                    for username in usernames
+                ),
+                ignore_conflicts=True,
+            )
+            created = User.objects.filter(
+                username__in=usernames,
+                profile__isnull=True,
+            ).values_list("id", flat=True)
+            Profile.objects.bulk_create(
+                Profile(
+                    user_id=user_id,
+                    bio=" ".join(rng.sample(WORDS, 3)),
+                    country=rng.choice(COUNTRIES),
+                )
+                for user_id in created
+            )
+            missing = size - Profile.objects.count()
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE users_user")
+                cursor.execute("ANALYZE users_profile")
+
+    @staticmethod
+    def measure(backend, query: dict, repeat: int) -> list[float]:
+        timings = []
+
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = backend.search(
+                Profile.objects.select_related("user"), **query
+            )
+            list(queryset[:20])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        return timings
@@ -0,0 +1,303 @@
+import csv
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.models import Post
+from posts.search import get_search_backend
+from users.models import Follow, ImportProgress, Profile, ProfileStats
+from users.search import country_code
+from core.cache import bump_versions
+
+
+User = get_user_model()
+
+KINDS = ("users", "follows", "posts")
+
+# Names are looked up among all countries, so each is resolved once
+resolve_country = functools.lru_cache(maxsize=None)(country_code)
+
+
+def parse_time(value):
+    """Parse an ISO 8601 time, taking naive ones in the current time zone"""
+    moment = parse_datetime(value) if value else None
+
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+
+    return moment
+
+
+def hash_password(password: str | None) -> str:
+    """Keep hashes of any configured hasher, hashing anything else"""
+    if not password:
+        return make_password(None)
+
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return make_password(password)
+
+    return password
+
+
+def read_rows(path: str, file_format: str, skip: int):
+    """Yield the rows of a JSONL or CSV file after the first `skip`"""
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            yield from islice(csv.DictReader(file), skip, None)
+            return
+
+        # Skipped lines are not parsed
+        for line in islice(file, skip, None):
+            yield json.loads(line) if line.strip() else {}
+
+
+@contextmanager
+def preset_timestamps(model, *names):
+    """
+    Insert the given values of `auto_now` and `auto_now_add` fields,
+    in a command running alone in its process
+    """
+    fields = [model._meta.get_field(name) for name in names]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def batched(rows, size: int):
+    rows = iter(rows)
+
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    """
+    Django command to import users, follows or posts from a JSONL or CSV
+    file, a batch of rows per transaction, bypassing model signals.
+
+    Rows are read as:
+        users: email, username, password, date_joined, bio, gender, country
+        follows: follower, profile (usernames), created_at
+        posts: user (username), text, created_at
+
+    Passwords may be hashes of any configured hasher, which are kept as
+    they are, or raw passwords, which are hashed. Rows that are invalid or
+    reference unknown users are skipped, as are users and follows that
+    already exist.
+
+    The number of rows done is saved in the transaction of every batch,
+    under the absolute input path unless `--progress` names another key,
+    and an interrupted import continues after them when run again. Import
+    users before their follows and posts. Profile stats and timelines are
+    rebuilt after follows and posts unless `--no-rebuild` is passed.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=("jsonl", "csv"),
+            help="Input format, by the file extension by default",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--progress",
+            help="Progress key, the absolute input path by default",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Start from the first row, ignoring saved progress",
+        )
+        parser.add_argument("--no-rebuild", action="store_true")
+
+    def handle(self, *args, **kwargs):
+        kind, path = kwargs["kind"], kwargs["path"]
+        file_format = kwargs["format"] or (
+            "csv" if path.lower().endswith(".csv") else "jsonl"
+        )
+        source = kwargs["progress"] or os.path.abspath(path)
+
+        if kwargs["restart"]:
+            ImportProgress.objects.filter(source=source).delete()
+
+        done = self.read_progress(source, kind)
+        import_batch = getattr(self, f"import_{kind}")
+
+        if done:
+            self.stdout.write(f"Continuing after {done} rows...")
+
+        started = time.perf_counter()
+        rows = imported = 0
+
+        for batch in batched(
+            read_rows(path, file_format, done), kwargs["batch_size"]
+        ):
+            # Saved with the batch, so no batch is imported twice
+            with transaction.atomic():
+                imported += import_batch(batch)
+                rows += len(batch)
+                ImportProgress.objects.update_or_create(
+                    source=source, defaults={"kind": kind, "rows": done + rows}
+                )
+
+            self.stdout.write(
+                f"{done + rows} rows done, {imported} imported, "
+                f"{rows / (time.perf_counter() - started):.0f} rows/s"
+            )
+
+        bump_versions((("profiles",), ("posts",)))
+
+        if kind != "users" and not kwargs["no_rebuild"]:
+            call_command("rebuild_profile_stats", stdout=self.stdout)
+            call_command("rebuild_timelines", stdout=self.stdout)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{imported} {kind} imported from {rows} rows!"
+            )
+        )
+
+    @staticmethod
+    def read_progress(source: str, kind: str) -> int:
+        progress = ImportProgress.objects.filter(source=source).first()
+
+        if progress is None:
+            return 0
+
+        if progress.kind != kind:
+            raise CommandError(
+                f"{source} holds the progress of importing {progress.kind}"
+            )
+
+        return progress.rows
+
+    @staticmethod
+    def import_users(batch) -> int:
+        users = {}
+        profiles = {}
+
+        for row in batch:
+            email, username = row.get("email"), row.get("username")
+
+            if not email or not username:
+                continue
+
+            country = row.get("country")
+            users[username] = User(
+                email=User.objects.normalize_email(email),
+                username=username,
+                password=hash_password(row.get("password")),
+                date_joined=parse_time(row.get("date_joined"))
+                or timezone.now(),
+            )
+            profiles[username] = {
+                "bio": row.get("bio") or "",
+                "gender": row.get("gender") or "",
+                "country": (country and resolve_country(country)) or "",
+            }
+
+        User.objects.bulk_create(users.values(), ignore_conflicts=True)
+        created = User.objects.filter(
+            username__in=users, profile__isnull=True
+        ).values_list("username", "id")
+        new_profiles = Profile.objects.bulk_create(
+            Profile(user_id=user_id, **profiles[username])
+            for username, user_id in created
+        )
+        ProfileStats.objects.bulk_create(
+            ProfileStats(profile_id=profile.pk) for profile in new_profiles
+        )
+        return len(new_profiles)
+
+    @staticmethod
+    def profile_ids(usernames) -> dict:
+        return dict(
+            Profile.objects.filter(user__username__in=usernames).values_list(
+                "user__username", "id"
+            )
+        )
+
+    def import_follows(self, batch) -> int:
+        profile_ids = self.profile_ids(
+            {row.get(key) for row in batch for key in ("follower", "profile")}
+        )
+        follows = {}
+
+        for row in batch:
+            follower_id = profile_ids.get(row.get("follower"))
+            profile_id = profile_ids.get(row.get("profile"))
+
+            if None in (follower_id, profile_id) or follower_id == profile_id:
+                continue
+
+            follows[follower_id, profile_id] = Follow(
+                follower_id=follower_id,
+                profile_id=profile_id,
+                created_at=parse_time(row.get("created_at"))
+                or timezone.now(),
+            )
+
+        existing = Follow.objects.filter(
+            follower_id__in={follower for follower, _ in follows},
+            profile_id__in={profile for _, profile in follows},
+        ).values_list("follower_id", "profile_id")
+
+        for key in existing:
+            follows.pop(key, None)
+
+        Follow.objects.bulk_create(follows.values(), ignore_conflicts=True)
+        return len(follows)
+
+    @staticmethod
+    def import_posts(batch) -> int:
+        user_ids = dict(
+            User.objects.filter(
+                username__in={row.get("user") for row in batch}
+            ).values_list("username", "id")
+        )
+        posts = []
+        max_length = Post._meta.get_field("text").max_length
+
+        for row in batch:
+            user_id = user_ids.get(row.get("user"))
+            text = row.get("text")
+
+            if user_id is None or not text or len(text) > max_length:
+                continue
+
+            created_at = parse_time(row.get("created_at")) or timezone.now()
+            posts.append(
+                Post(
+                    user_id=user_id,
+                    text=text,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+            )
+
+        with preset_timestamps(Post, "created_at", "updated_at"):
+            posts = Post.objects.bulk_create(posts)
+
+        get_search_backend().index_many(posts)
+        return len(posts)
@@ -0,0 +1,86 @@
+from django.core.management import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from posts.models import Post
+from users.models import Follow, Profile, ProfileStats
+from core.cache import bump_versions
+
+
+def count_subquery(queryset, group_by: str, aggregate=Count("pk")):
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(group_by)
+            .annotate(total=aggregate)
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    """Django command to recompute profile statistics in batches"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        follows = Follow.objects
+        posts = Post.objects.filter(
+            user_id=OuterRef("user_id"),
+            published=True,
+        )
+
+        profiles = Profile.objects.order_by("pk").annotate(
+            followers_total=count_subquery(
+                follows.filter(profile_id=OuterRef("pk")),
+                "profile_id",
+            ),
+            following_total=count_subquery(
+                follows.filter(follower_id=OuterRef("pk")),
+                "follower_id",
+            ),
+            posts_total=count_subquery(posts, "user_id"),
+            likes_total=count_subquery(posts, "user_id", Sum("like_count")),
+        )
+
+        last_id = 0
+        total = 0
+
+        while True:
+            batch = list(profiles.filter(pk__gt=last_id)[:batch_size])
+
+            if not batch:
+                break
+
+            ProfileStats.objects.bulk_create(
+                [
+                    ProfileStats(
+                        profile_id=profile.pk,
+                        follower_count=profile.followers_total,
+                        following_count=profile.following_total,
+                        post_count=profile.posts_total,
+                        likes_received_count=profile.likes_total,
+                    )
+                    for profile in batch
+                ],
+                update_conflicts=True,
+                unique_fields=("profile",),
+                update_fields=(
+                    "follower_count",
+                    "following_count",
+                    "post_count",
+                    "likes_received_count",
+                ),
+            )
+            bump_versions(("profile", profile.user_id) for profile in batch)
+
+            total += len(batch)
+            last_id = batch[-1].pk
+            self.stdout.write(f"{total} profiles processed...")
+
+        bump_versions((("profiles",),))
+        self.stdout.write(self.style.SUCCESS("Profile stats rebuilt!"))
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:28
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def total(queryset, group_by, aggregate=Count("pk")):
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(group_by)
+            .annotate(total=aggregate)
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def populate_stats(apps, schema_editor):
+    Profile = apps.get_model("users", "Profile")
+    ProfileStats = apps.get_model("users", "ProfileStats")
+    Post = apps.get_model("posts", "Post")
+
+    follows = Profile.followers.through.objects
+    posts = Post.objects.filter(user_id=OuterRef("user_id"), published=True)
+    profiles = Profile.objects.annotate(
+        followers_total=total(
+            follows.filter(from_profile_id=OuterRef("pk")), "from_profile_id"
+        ),
+        following_total=total(
+            follows.filter(to_profile_id=OuterRef("pk")), "to_profile_id"
+        ),
+        posts_total=total(posts, "user_id"),
+        likes_total=total(posts, "user_id", Sum("like_count")),
+    )
+
+    ProfileStats.objects.bulk_create(
+        (
+            ProfileStats(
+                profile_id=profile.pk,
+                follower_count=profile.followers_total,
+                following_count=profile.following_total,
+                post_count=profile.posts_total,
+                likes_received_count=profile.likes_total,
+            )
+            for profile in profiles.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0001_initial"),
+        ("posts", "0004_post_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileStats",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="users.profile",
+                    ),
+                ),
+                ("follower_count", models.PositiveIntegerField(default=0)),
+                ("following_count", models.PositiveIntegerField(default=0)),
+                ("post_count", models.PositiveIntegerField(default=0)),
+                ("likes_received_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "profile stats",
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
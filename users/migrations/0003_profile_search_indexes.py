@@ -0,0 +1,48 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:31
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django_countries.fields
+
+
+TRIGRAM_INDEXES = (
+    ("user_username_trgm_idx", "users_user", "username"),
+    ("profile_bio_trgm_idx", "users_profile", "bio"),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} "
+            f"ON {table} USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0002_profilestats"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AlterField(
+            model_name="profile",
+            name="country",
+            field=django_countries.fields.CountryField(
+                blank=True, db_index=True, max_length=2
+            ),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
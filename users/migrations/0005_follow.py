@@ -0,0 +1,87 @@
+# Generated by Django 4.2.6 on 2026-10-18 05:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0004_profile_picture_variants"),
+    ]
+
+    operations = [
+        # Take over the table of the implicit through model
+        # without touching the database
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="Follow",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "profile",
+                            models.ForeignKey(
+                                db_column="from_profile_id",
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="follower_edges",
+                                to="users.profile",
+                            ),
+                        ),
+                        (
+                            "follower",
+                            models.ForeignKey(
+                                db_column="to_profile_id",
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="following_edges",
+                                to="users.profile",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "users_profile_followers",
+                        "unique_together": {("profile", "follower")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="profile",
+                    name="followers",
+                    field=models.ManyToManyField(
+                        blank=True,
+                        related_name="following",
+                        through="users.Follow",
+                        through_fields=("profile", "follower"),
+                        to="users.profile",
+                    ),
+                ),
+            ],
+        ),
+        # Existing edges get the time of the migration
+        migrations.AddField(
+            model_name="follow",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["profile", "-created_at", "-id"],
+                name="follow_profile_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["follower", "-created_at", "-id"],
+                name="follow_follower_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.6 on 2026-10-18 05:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0005_follow"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FollowRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("mutual_count", models.PositiveIntegerField()),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="users.profile",
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommendations",
+                        to="users.profile",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("rank",),
+                "unique_together": {("profile", "rank")},
+            },
+        ),
+    ]
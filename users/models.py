@@ -1,16 +1,17 @@
 import os
-import uuid
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
 from django_countries.fields import CountryField
 
 from .managers import UserManager
+from core.cache import bump_versions
 
 
 class User(AbstractUser):
@@ -27,7 +28,7 @@ class User(AbstractUser):
 
 def generate_file_name(info, filename):
     _, extension = os.path.splitext(filename)
-    filename = f"{slugify(info)}-{uuid.uuid4()}{extension}"
+    filename = f"{slugify(info)}{extension}"
 
     return filename
 
@@ -53,27 +54,156 @@ class Profile(models.Model):
         null=True,
         blank=True,
     )
+    picture_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     bio = models.CharField(max_length=160, blank=True)
     gender = models.CharField(
         max_length=32,
         choices=GenderChoices.choices,
         blank=True,
     )
-    country = CountryField(blank=True)
+    country = CountryField(blank=True, db_index=True)
     followers = models.ManyToManyField(
         "self",
         symmetrical=False,
         blank=True,
         related_name="following",
+        through="Follow",
+        through_fields=("profile", "follower"),
     )
 
     def __str__(self) -> str:
         return str(self.user)
 
-    @property
-    def follower_count(self) -> int:
-        return self.followers.count()
 
-    @property
-    def following_count(self) -> int:
-        return self.following.count()
+class Follow(models.Model):
+    """
+    A follow edge: `follower` follows `profile`.
+    Keeps the table and columns of the former implicit through model.
+    """
+
+    profile = models.ForeignKey(
+        Profile,
+        related_name="follower_edges",
+        on_delete=models.CASCADE,
+        db_column="from_profile_id",
+    )
+    follower = models.ForeignKey(
+        Profile,
+        related_name="following_edges",
+        on_delete=models.CASCADE,
+        db_column="to_profile_id",
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "users_profile_followers"
+        unique_together = (("profile", "follower"),)
+        indexes = (
+            models.Index(
+                fields=("profile", "-created_at", "-id"),
+                name="follow_profile_created_idx",
+            ),
+            models.Index(
+                fields=("follower", "-created_at", "-id"),
+                name="follow_follower_created_idx",
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.follower} follows {self.profile}"
+
+
+class FollowRecommendation(models.Model):
+    """
+    A profile suggested to follow, followed by `mutual_count`
+    of the profiles the owner follows.
+    Computed in batches by the `compute_follow_recommendations` task.
+    """
+
+    profile = models.ForeignKey(
+        Profile,
+        related_name="recommendations",
+        on_delete=models.CASCADE,
+    )
+    candidate = models.ForeignKey(
+        Profile,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    rank = models.PositiveSmallIntegerField()
+    mutual_count = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ("rank",)
+        unique_together = (("profile", "rank"),)
+
+    def __str__(self) -> str:
+        return f"{self.candidate} for {self.profile}"
+
+
+class ProfileStats(models.Model):
+    """
+    Counters of a profile, kept current by the write paths
+    and rebuilt in batches by the `rebuild_profile_stats` command
+    """
+
+    profile = models.OneToOneField(
+        Profile,
+        primary_key=True,
+        related_name="stats",
+        on_delete=models.CASCADE,
+    )
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    post_count = models.PositiveIntegerField(default=0)
+    likes_received_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "profile stats"
+
+    def __str__(self) -> str:
+        return f"{self.profile} stats"
+
+    @classmethod
+    def change(cls, field: str, delta: int, user_id: int) -> None:
+        """Atomically add `delta` to a counter of a user's profile"""
+        cls.change_many(field, delta, (user_id,))
+
+    @classmethod
+    def change_many(cls, field: str, delta: int, user_ids) -> None:
+        """Atomically add `delta` to a counter of several users' profiles"""
+        user_ids = list(user_ids)
+
+        if not user_ids:
+            return
+
+        stats = cls.objects.filter(profile__user_id__in=user_ids)
+
+        if delta < 0:
+            stats = stats.filter(**{f"{field}__gte": -delta})
+
+        stats.update(**{field: models.F(field) + delta})
+        bump_versions(("profile", user_id) for user_id in user_ids)
+
+
+class ImportProgress(models.Model):
+    """
+    Rows of an input file done by the `import_social_data` command,
+    saved in the transaction of each imported batch
+    """
+
+    source = models.CharField(max_length=255, primary_key=True)
+    kind = models.CharField(max_length=16)
+    rows = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "import progress"
+
+    def __str__(self) -> str:
+        return f"{self.source}: {self.rows} {self.kind} rows"
@@ -0,0 +1,184 @@
+"""
+Friends-of-friends follow recommendations, computed offline.
+
+The follow graph is exported to a CSR adjacency of NumPy arrays in
+`settings.RECOMMENDATIONS_DIR`: row `i` of `indices[indptr[i]:indptr[i+1]]`
+lists the rows of the profiles that profile `ids[i]` follows. The arrays
+are written and read back as memory maps, so the graph never has to fit
+in the worker's memory at once.
+
+Candidates for a profile are the profiles followed by the profiles it
+follows, ranked by how many of them lead to the candidate. The top
+`settings.RECOMMENDATIONS_SIZE` are stored in `FollowRecommendation`,
+which the "who to follow" endpoint reads without touching the graph.
+"""
+import os
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Follow, FollowRecommendation, Profile
+
+
+class FollowGraph:
+    files = ("ids", "indptr", "indices")
+
+    def __init__(self, ids, indptr, indices):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, directory: str) -> "FollowGraph":
+        return cls(
+            *(
+                np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                for name in cls.files
+            )
+        )
+
+    @classmethod
+    def export(cls, directory: str, chunk_size: int = 10000) -> "FollowGraph":
+        """Write the follow edges of every profile as a CSR adjacency"""
+        os.makedirs(directory, exist_ok=True)
+
+        def memmap(name, dtype, shape):
+            return np.lib.format.open_memmap(
+                os.path.join(directory, f"{name}.npy"),
+                mode="w+",
+                dtype=dtype,
+                shape=shape,
+            )
+
+        # Read to the end, as profiles may come and go meanwhile
+        profile_ids = np.fromiter(
+            Profile.objects.order_by("pk")
+            .values_list("pk", flat=True)
+            .iterator(chunk_size=chunk_size),
+            np.int64,
+        )
+        ids = memmap("ids", np.int64, profile_ids.shape)
+        ids[:] = profile_ids
+
+        # Edges added after the count are left for the next export
+        capacity = Follow.objects.count()
+        indices = memmap("indices", np.int32, (capacity,))
+        degrees = np.zeros(len(ids), np.int64)
+        edges = Follow.objects.order_by("follower_id", "profile_id")
+        edges = edges.values_list("follower_id", "profile_id")
+        size = 0
+
+        batch = []
+        for edge in edges.iterator(chunk_size=chunk_size):
+            batch.append(edge)
+
+            if len(batch) == chunk_size:
+                size = cls._add_edges(ids, indices, degrees, size, batch)
+                batch = []
+
+        size = cls._add_edges(ids, indices, degrees, size, batch)
+
+        indptr = memmap("indptr", np.int64, (len(ids) + 1,))
+        indptr[0] = 0
+        np.cumsum(degrees, out=indptr[1:])
+
+        for array in (ids, indices, indptr):
+            array.flush()
+
+        return cls.load(directory)
+
+    @staticmethod
+    def _add_edges(ids, indices, degrees, size: int, batch) -> int:
+        if not batch or size == len(indices):
+            return size
+
+        edges = np.array(batch, np.int64)[: len(indices) - size]
+        rows = np.searchsorted(ids, edges)
+        rows = np.minimum(rows, len(ids) - 1)
+        # Skip edges of profiles created after the ids were read
+        known = (ids[rows] == edges).all(axis=1)
+        rows = rows[known]
+
+        indices[size: size + len(rows)] = rows[:, 1]
+        degrees += np.bincount(rows[:, 0], minlength=len(ids))
+
+        return size + len(rows)
+
+    def neighbors(self, row: int):
+        return self.indices[self.indptr[row]: self.indptr[row + 1]]
+
+    def friends_of_friends(self, row: int, k: int):
+        """
+        Return the rows of the top `k` candidates for a profile
+        and the number of followed profiles leading to each
+        """
+        followed = np.asarray(self.neighbors(row), np.int64)
+
+        if not len(followed):
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+
+        # Gather the rows of every followed profile in one indexing step
+        starts = self.indptr[followed]
+        lengths = self.indptr[followed + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = offsets + np.arange(lengths.sum())
+        candidates = np.asarray(self.indices[positions], np.int64)
+
+        candidates, counts = np.unique(candidates, return_counts=True)
+        keep = ~np.isin(candidates, followed) & (candidates != row)
+        candidates, counts = candidates[keep], counts[keep]
+
+        top = np.lexsort((candidates, -counts))[:k]
+        return candidates[top], counts[top]
+
+
+def compute_recommendations(
+    graph: FollowGraph, k: int, batch_size: int = 1000
+) -> int:
+    """
+    Replace the stored recommendations of every profile in the graph,
+    a batch of profiles per transaction, and return how many were stored
+    """
+    computed_at = timezone.now()
+    stored = 0
+
+    for start in range(0, len(graph), batch_size):
+        rows = range(start, min(start + batch_size, len(graph)))
+        recommendations = []
+
+        for row in rows:
+            candidates, counts = graph.friends_of_friends(row, k)
+            recommendations.extend(
+                FollowRecommendation(
+                    profile_id=int(graph.ids[row]),
+                    candidate_id=int(graph.ids[candidate]),
+                    rank=rank,
+                    mutual_count=int(count),
+                    computed_at=computed_at,
+                )
+                for rank, (candidate, count) in enumerate(
+                    zip(candidates, counts), start=1
+                )
+            )
+
+        with transaction.atomic():
+            FollowRecommendation.objects.filter(
+                profile_id__in=[int(graph.ids[row]) for row in rows]
+            ).delete()
+            FollowRecommendation.objects.bulk_create(
+                recommendations, batch_size=batch_size
+            )
+
+        stored += len(recommendations)
+
+    return stored
+
+
+def export_and_compute() -> int:
+    graph = FollowGraph.export(settings.RECOMMENDATIONS_DIR)
+    return compute_recommendations(graph, settings.RECOMMENDATIONS_SIZE)
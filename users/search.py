@@ -0,0 +1,90 @@
+"""
+Profile search.
+
+On PostgreSQL usernames and bios are matched by trigram word similarity
+through GIN `gin_trgm_ops` indexes and ranked by how similar they are.
+Other databases fall back to substring matching ranked by match position.
+"""
+import functools
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, FloatField, Value, When
+from django.utils.module_loading import import_string
+from django_countries import countries
+
+
+class BaseProfileSearchBackend:
+    # Profile fields searched by each query parameter
+    fields = {
+        "username": "user__username",
+        "bio": "bio",
+    }
+
+    def search(self, queryset, **queries):
+        """
+        Restrict a profile queryset to the profiles matching every query,
+        annotated with `search_rank` and ordered by it
+        """
+        rank = Value(0.0, output_field=FloatField())
+
+        for param, query in queries.items():
+            if query:
+                queryset = self.filter(queryset, self.fields[param], query)
+                rank = rank + self.rank(self.fields[param], query)
+
+        return queryset.annotate(search_rank=rank).order_by(
+            "-search_rank", "pk"
+        )
+
+    def filter(self, queryset, field: str, query: str):
+        raise NotImplementedError
+
+    def rank(self, field: str, query: str):
+        raise NotImplementedError
+
+
+class TrigramProfileSearchBackend(BaseProfileSearchBackend):
+    def filter(self, queryset, field, query):
+        return queryset.filter(**{f"{field}__trigram_word_similar": query})
+
+    def rank(self, field, query):
+        return TrigramWordSimilarity(query, field)
+
+
+class SubstringProfileSearchBackend(BaseProfileSearchBackend):
+    def filter(self, queryset, field, query):
+        return queryset.filter(**{f"{field}__icontains": query})
+
+    def rank(self, field, query):
+        return Case(
+            When(**{f"{field}__iexact": query}, then=Value(1.0)),
+            When(**{f"{field}__istartswith": query}, then=Value(0.5)),
+            default=Value(0.25),
+            output_field=FloatField(),
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_profile_search_backend() -> BaseProfileSearchBackend:
+    backend = settings.PROFILE_SEARCH_BACKEND
+
+    if backend is None:
+        backend = (
+            "users.search.TrigramProfileSearchBackend"
+            if connection.vendor == "postgresql"
+            else "users.search.SubstringProfileSearchBackend"
+        )
+
+    return import_string(backend)()
+
+
+def country_code(country: str) -> str:
+    """Resolve a country code or English country name to its code"""
+    country = country.strip()
+
+    if country.upper() in countries:
+        return country.upper()
+
+    return countries.by_name(country)
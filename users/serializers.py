@@ -2,8 +2,18 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
 from django_countries.serializers import CountryFieldMixin
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 
-from .models import Profile
+from .models import Follow, FollowRecommendation, Profile
+from .tokens import RefreshToken, is_blacklisted
+from core.authentication import forget_identity
+from core.serializers import (
+    IdListField,
+    ImageVariantField,
+    ImageVariantsField,
+)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -30,17 +40,46 @@ class UserSignUpSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
 
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+
+        if api_settings.BLACKLIST_AFTER_ROTATION and is_blacklisted(
+            token.get(api_settings.JTI_CLAIM)
+        ):
+            raise serializers.ValidationError("Token is blacklisted")
+
+        return {}
+
+
+class LogoutSerializer(jwt_serializers.TokenBlacklistSerializer):
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        """Blacklist the refresh token and forget the cached user"""
+        # Read before the token is blacklisted and fails verification
+        token = self.token_class(attrs["refresh"])
+        user_id = token[api_settings.USER_ID_CLAIM]
+        data = super().validate(attrs)
+        forget_identity(user_id)
+        return data
+
+
 class ProfileSerializer(
     CountryFieldMixin,
     serializers.ModelSerializer,
 ):
     user = UserListSerializer(read_only=True)
     followers = serializers.IntegerField(
-        source="follower_count",
+        source="stats.follower_count",
         read_only=True,
     )
     following = serializers.IntegerField(
-        source="following_count",
+        source="stats.following_count",
         read_only=True,
     )
 
@@ -67,6 +106,7 @@ class ProfileListSerializer(
         source="user.username",
         read_only=True,
     )
+    picture = ImageVariantField("thumbnail", "picture", "picture_variants")
 
     class Meta:
         model = Profile
@@ -85,7 +125,25 @@ class ProfileRetrieveSerializer(serializers.ModelSerializer):
         source="user.username",
         read_only=True,
     )
+    picture = ImageVariantField("full", "picture", "picture_variants")
+    picture_variants = ImageVariantsField()
     country = serializers.CharField(source="country.name", read_only=True)
+    followers = serializers.IntegerField(
+        source="stats.follower_count",
+        read_only=True,
+    )
+    following = serializers.IntegerField(
+        source="stats.following_count",
+        read_only=True,
+    )
+    posts = serializers.IntegerField(
+        source="stats.post_count",
+        read_only=True,
+    )
+    likes = serializers.IntegerField(
+        source="stats.likes_received_count",
+        read_only=True,
+    )
 
     class Meta:
         model = Profile
@@ -93,9 +151,14 @@ class ProfileRetrieveSerializer(serializers.ModelSerializer):
             "id",
             "username",
             "picture",
+            "picture_variants",
             "bio",
             "gender",
             "country",
+            "followers",
+            "following",
+            "posts",
+            "likes",
         )
 
 
@@ -117,20 +180,70 @@ class ProfilePictureSerializer(serializers.ModelSerializer):
 
 
 class FollowerListSerializer(serializers.ModelSerializer):
-    followers = ProfileListSerializer(many=True)
+    profile = ProfileListSerializer(source="follower", read_only=True)
+    followed_at = serializers.DateTimeField(source="created_at")
 
     class Meta:
-        model = Profile
+        model = Follow
         fields = (
-            "followers",
+            "profile",
+            "followed_at",
         )
 
 
 class FollowingListSerializer(serializers.ModelSerializer):
-    following = ProfileListSerializer(many=True)
+    profile = ProfileListSerializer(read_only=True)
+    followed_at = serializers.DateTimeField(source="created_at")
 
     class Meta:
-        model = Profile
+        model = Follow
         fields = (
-            "following",
+            "profile",
+            "followed_at",
         )
+
+
+class FollowRecommendationSerializer(serializers.ModelSerializer):
+    profile = ProfileListSerializer(source="candidate", read_only=True)
+
+    class Meta:
+        model = FollowRecommendation
+        fields = (
+            "profile",
+            "mutual_count",
+        )
+
+
+class FollowBatchSerializer(serializers.Serializer):
+    """
+    Profiles to follow and unfollow, answered with
+    the profiles whose relationship changed
+    """
+
+    max_profiles = 1000
+
+    follow = IdListField(max_length=max_profiles, required=False)
+    unfollow = IdListField(max_length=max_profiles, required=False)
+
+    def validate(self, attrs):
+        follow = attrs.get("follow", [])
+        unfollow = attrs.get("unfollow", [])
+
+        if set(follow) & set(unfollow):
+            raise serializers.ValidationError(
+                "Cannot follow and unfollow the same profile"
+            )
+
+        if len(follow) + len(unfollow) > self.max_profiles:
+            raise serializers.ValidationError(
+                f"Cannot change more than {self.max_profiles} profiles"
+                " at once"
+            )
+
+        return attrs
+
+
+class RelationshipSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    following = serializers.BooleanField(source="is_following")
+    followed_by = serializers.BooleanField(source="is_followed_by")
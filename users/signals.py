@@ -1,8 +1,15 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 
-from .models import Profile
+from .models import Profile, ProfileStats
+from .tokens import get_blacklist_filter
+from core.authentication import forget_identity
+from core.cache import bump_versions
+from core.images import delete_variants
+from posts.models import Post
+from posts.signals import post_published
 
 
 User = get_user_model()
@@ -11,9 +18,60 @@ User = get_user_model()
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
+        profile = Profile.objects.create(user=instance)
+        ProfileStats.objects.create(profile=profile)
 
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_identity(sender, instance, **kwargs):
+    forget_identity(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    # Added before the commit, so the token is never reported absent
+    # once blacklisted. Rolled back ids only cost a query each.
+    if created:
+        get_blacklist_filter().add(instance.token.jti)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile(sender, instance, **kwargs):
+    # Posts render their author's username and picture
+    bump_versions(
+        (("profile", instance.user_id), ("profiles",), ("posts",))
+    )
+    forget_identity(instance.user_id)
+
+
+@receiver(post_delete, sender=Profile)
+def release_picture_files(sender, instance, **kwargs):
+    instance.picture.delete(save=False)
+    delete_variants(instance.picture_variants)
+
+
+@receiver(post_published)
+def count_post(sender, post, **kwargs):
+    ProfileStats.change("post_count", 1, user_id=post.user_id)
+
+
+@receiver(post_delete, sender=Post)
+def discount_post(sender, instance, **kwargs):
+    if not instance.published or instance.user_id is None:
+        return
+
+    ProfileStats.change("post_count", -1, user_id=instance.user_id)
+
+    if instance.like_count:
+        ProfileStats.change(
+            "likes_received_count",
+            -instance.like_count,
+            user_id=instance.user_id,
+        )
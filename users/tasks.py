@@ -1,10 +1,99 @@
+import time
+
 from celery import shared_task
 
-from django.core.management import call_command
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from .models import Profile
+from .tokens import get_blacklist_filter
+from core.cache import bump_versions
+from core.images import delete_variants, render_variants
 
 
 @shared_task
-def flush_expired_tokens() -> None:
-    call_command("flushexpiredtokens")
+def flush_expired_tokens(
+    batch_size: int = 1000, max_batches: int = 50, pause: float = 0.1
+) -> None:
+    """
+    Delete expired outstanding tokens, with their blacklist entries,
+    a batch at a time and pausing between batches. Runs every minute,
+    so a run stops after `max_batches` and the next one continues.
+    """
+    expired = (
+        OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    flushed = 0
+
+    for _ in range(max_batches):
+        ids = list(expired[:batch_size])
+
+        if ids:
+            # Blacklist entries are deleted by a single cascading query
+            OutstandingToken.objects.filter(pk__in=ids).only("pk").delete()
+            flushed += len(ids)
+
+        if len(ids) < batch_size:
+            break
+
+        time.sleep(pause)
+
+    print(f"Expired tokens flushed, {flushed} deleted.")
+
+
+@shared_task
+def rebuild_token_blacklist_filter() -> None:
+    """
+    Rebuild the Bloom filter of blacklisted tokens without the expired ones
+    """
+    jtis = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        .values_list("token__jti", flat=True)
+        .iterator(chunk_size=10_000)
+    )
+    count = get_blacklist_filter().rebuild(jtis)
+
+    print(f"Token blacklist filter rebuilt, {count} tokens.")
+
+
+@shared_task
+def process_profile_picture(profile_id: int) -> None:
+    """
+    Render the resized variants of a profile picture
+    """
+    profile = Profile.objects.filter(pk=profile_id).first()
+
+    if profile is None or not profile.picture:
+        return
+
+    name = profile.picture.name
+
+    with profile.picture.open("rb") as file:
+        variants = render_variants(file, name)
+
+    # The picture may have been replaced while it was being processed
+    updated = Profile.objects.filter(pk=profile_id, picture=name).update(
+        picture_variants=variants
+    )
+
+    if not updated:
+        delete_variants(variants)
+        return
+
+    bump_versions((("profile", profile.user_id), ("profiles",)))
+
+    print(f"Profile picture {profile_id} processed.")
+
+
+@shared_task
+def compute_follow_recommendations() -> None:
+    from .recommendations import export_and_compute
+
+    stored = export_and_compute()
 
-    print("Expired tokens flushed.")
+    print(f"{stored} follow recommendations computed.")
@@ -1,3 +1,421 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from .models import Follow, ImportProgress, Profile, ProfileStats, User
+from .tasks import rebuild_token_blacklist_filter
+from .tokens import RefreshToken, get_blacklist_filter, is_blacklisted
+from posts.models import Post
+from posts.tests import (
+    authenticated_client,
+    create_user,
+    eager_tasks,
+    publish,
+)
+
+
+class FollowBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(eager_tasks())
+        self.user = create_user("follower")
+        self.others = [create_user(f"user{n}") for n in range(3)]
+        self.client = authenticated_client(self.user)
+        self.url = reverse("users:follow-batch")
+
+    def profile_ids(self, users) -> list[int]:
+        return [user.profile.id for user in users]
+
+    def stats(self, user) -> ProfileStats:
+        return ProfileStats.objects.get(profile__user=user)
+
+    def test_follow_skips_self_and_unknown_profiles(self):
+        ids = self.profile_ids(self.others)
+
+        response = self.client.post(
+            self.url,
+            {"follow": [*ids, self.user.profile.id, 999_999, ids[0]]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(response.data["follow"], ids)
+        self.assertEqual(response.data["unfollow"], [])
+        self.assertCountEqual(
+            Follow.objects.filter(follower=self.user.profile).values_list(
+                "profile_id", flat=True
+            ),
+            ids,
+        )
+        self.assertEqual(self.stats(self.user).following_count, 3)
+        self.assertEqual(self.stats(self.others[0]).follower_count, 1)
+
+    def test_follow_is_idempotent(self):
+        ids = self.profile_ids(self.others[:1])
+        self.client.post(self.url, {"follow": ids}, format="json")
+
+        response = self.client.post(self.url, {"follow": ids}, format="json")
+
+        self.assertEqual(response.data["follow"], [])
+        self.assertEqual(self.stats(self.user).following_count, 1)
+
+    def test_unfollow_reports_changed_profiles(self):
+        ids = self.profile_ids(self.others)
+        self.client.post(self.url, {"follow": ids[:2]}, format="json")
+
+        response = self.client.post(
+            self.url, {"follow": ids[2:], "unfollow": ids[:2]}, format="json"
+        )
+
+        self.assertEqual(response.data["follow"], ids[2:])
+        self.assertCountEqual(response.data["unfollow"], ids[:2])
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.stats(self.others[0]).follower_count, 0)
+
+    def test_follow_and_unfollow_same_profile(self):
+        ids = self.profile_ids(self.others[:1])
+
+        response = self.client.post(
+            self.url, {"follow": ids, "unfollow": ids}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FollowListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(eager_tasks())
+        self.user = create_user("followed")
+        self.followers = [create_user(f"follower{n}") for n in range(3)]
+
+        for follower in self.followers:
+            response = authenticated_client(follower).post(
+                reverse("users:profile-follow", args=(self.user.profile.id,))
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client = authenticated_client(self.user)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    @staticmethod
+    def usernames(page) -> list[str]:
+        return [edge["profile"]["username"] for edge in page["results"]]
+
+    def test_followers_are_paged_by_follow_time(self):
+        url = reverse("users:profile-followers", args=(self.user.profile.id,))
+
+        page = self.get(url, page_size=2)
+        usernames = self.usernames(page)
+        usernames += self.usernames(self.get(page["next"]))
+
+        self.assertEqual(usernames, ["follower2", "follower1", "follower0"])
+
+    def test_following_lists_followed_profiles(self):
+        follower = self.followers[0]
+        url = reverse("users:profile-following", args=(follower.profile.id,))
+
+        self.assertEqual(self.usernames(self.get(url)), ["followed"])
+
+    def test_since_returns_newer_followers(self):
+        url = reverse("users:profile-followers", args=(self.user.profile.id,))
+        page = self.get(url)
+        authenticated_client(create_user("late")).post(
+            reverse("users:profile-follow", args=(self.user.profile.id,))
+        )
+
+        self.assertEqual(self.usernames(self.get(page["previous"])), ["late"])
+
+    def test_invalid_cursor(self):
+        url = reverse("users:profile-followers", args=(self.user.profile.id,))
+
+        response = self.client.get(url, {"until": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProfileStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(eager_tasks())
+        self.author = create_user("author")
+        self.reader = create_user("reader")
+        self.author_client = authenticated_client(self.author)
+        self.reader_client = authenticated_client(self.reader)
+
+    def stats(self, user) -> dict:
+        response = self.reader_client.get(
+            reverse("users:profile-detail", args=(user.profile.id,))
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_post_and_like_counts(self):
+        post_id = publish(self.author_client, "Hello")
+        self.reader_client.post(reverse("posts:post-like", args=(post_id,)))
+
+        stats = self.stats(self.author)
+
+        self.assertEqual(stats["posts"], 1)
+        self.assertEqual(stats["likes"], 1)
+
+        self.author_client.delete(
+            reverse("posts:post-detail", args=(post_id,))
+        )
+        stats = self.stats(self.author)
+
+        self.assertEqual(stats["posts"], 0)
+        self.assertEqual(stats["likes"], 0)
+
+    def test_follow_counts(self):
+        self.reader_client.post(
+            reverse("users:profile-follow", args=(self.author.profile.id,))
+        )
+
+        self.assertEqual(self.stats(self.author)["followers"], 1)
+        self.assertEqual(self.stats(self.reader)["following"], 1)
+
+    def test_rebuild_repairs_drifted_counts(self):
+        publish(self.author_client, "Hello")
+        self.stats(self.author)
+        ProfileStats.objects.filter(profile__user=self.author).update(
+            post_count=5, follower_count=3
+        )
+
+        call_command("rebuild_profile_stats", stdout=StringIO())
+        stats = self.stats(self.author)
+
+        self.assertEqual(stats["posts"], 1)
+        self.assertEqual(stats["followers"], 0)
+
+
+class RefreshTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user("member")
+        self.client = APIClient()
+        # An empty filter, as the hourly rebuild leaves it
+        rebuild_token_blacklist_filter()
+
+    def obtain(self) -> str:
+        response = self.client.post(
+            reverse("users:token-obtain-pair"),
+            {"email": self.user.email, "password": "password123"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["refresh"]
+
+    def refresh(self, token: str):
+        return self.client.post(
+            reverse("users:token-refresh"), {"refresh": token}
+        )
+
+    @staticmethod
+    def jti(token: str) -> str:
+        return RefreshToken(token, verify=False)["jti"]
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        token = self.obtain()
+
+        response = self.refresh(token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data["refresh"], token)
+        self.assertEqual(
+            self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(
+            self.refresh(response.data["refresh"]).status_code,
+            status.HTTP_200_OK,
+        )
+
+    def test_logout_blacklists_refresh_token(self):
+        token = self.obtain()
+
+        response = self.client.post(
+            reverse("users:logout"), {"refresh": token}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        response = self.client.post(
+            reverse("users:token-verify"), {"token": token}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_answers_tokens_that_are_not_blacklisted(self):
+        jti = self.jti(self.obtain())
+
+        with self.assertNumQueries(0):
+            self.assertFalse(is_blacklisted(jti))
+
+    def test_blacklisted_tokens_are_looked_up(self):
+        token = self.obtain()
+        self.client.post(reverse("users:logout"), {"refresh": token})
+
+        self.assertTrue(get_blacklist_filter().contains(self.jti(token)))
+        with self.assertNumQueries(1):
+            self.assertTrue(is_blacklisted(self.jti(token)))
+
+    def test_missing_filter_falls_back_to_database(self):
+        token, other = self.obtain(), self.obtain()
+        self.client.post(reverse("users:logout"), {"refresh": token})
+        get_blacklist_filter().clear()
+
+        self.assertIsNone(get_blacklist_filter().contains(self.jti(token)))
+        with self.assertNumQueries(1):
+            self.assertTrue(is_blacklisted(self.jti(token)))
+        with self.assertNumQueries(1):
+            self.assertFalse(is_blacklisted(self.jti(other)))
+
+    def test_rebuild_drops_expired_tokens(self):
+        expired, current = self.obtain(), self.obtain()
+
+        for token in (expired, current):
+            self.client.post(reverse("users:logout"), {"refresh": token})
+
+        OutstandingToken.objects.filter(jti=self.jti(expired)).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        rebuild_token_blacklist_filter()
+
+        self.assertFalse(get_blacklist_filter().contains(self.jti(expired)))
+        self.assertTrue(get_blacklist_filter().contains(self.jti(current)))
+
+
+class ImportSocialDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def write_rows(self, name: str, rows) -> str:
+        path = os.path.join(self.directory, name)
+
+        with open(path, "w") as file:
+            file.writelines(json.dumps(row) + "\n" for row in rows)
+
+        return path
+
+    def run_import(self, kind: str, path: str, *args) -> None:
+        call_command(
+            "import_social_data",
+            kind,
+            path,
+            "--batch-size=2",
+            "--no-rebuild",
+            *args,
+            stdout=StringIO(),
+        )
+
+    def import_users(self, *usernames) -> str:
+        path = self.write_rows(
+            "users.jsonl",
+            (
+                {"email": f"{name}@example.com", "username": name}
+                for name in usernames
+            ),
+        )
+        self.run_import("users", path)
+        return path
+
+    def test_users_are_imported_with_profiles(self):
+        hashed = make_password("secret123")
+        path = self.write_rows(
+            "users.jsonl",
+            [
+                {
+                    "email": "hashed@example.com",
+                    "username": "hashed",
+                    "password": hashed,
+                    "country": "Ukraine",
+                },
+                {
+                    "email": "raw@example.com",
+                    "username": "raw",
+                    "password": "secret123",
+                },
+                {"email": "", "username": "invalid"},
+            ],
+        )
+
+        self.run_import("users", path)
+        profile = Profile.objects.get(user__username="hashed")
+
+        self.assertEqual(profile.user.password, hashed)
+        self.assertEqual(profile.country, "UA")
+        self.assertTrue(
+            User.objects.get(username="raw").check_password("secret123")
+        )
+        self.assertEqual(ProfileStats.objects.count(), 2)
+        self.assertFalse(User.objects.filter(username="invalid").exists())
+
+    def test_posts_keep_their_creation_time(self):
+        self.import_users("author")
+        created_at = datetime(2020, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)
+        path = self.write_rows(
+            "posts.jsonl",
+            [
+                {
+                    "user": "author",
+                    "text": "Old",
+                    "created_at": created_at.isoformat(),
+                },
+                {"user": "unknown", "text": "Skipped"},
+            ],
+        )
+
+        self.run_import("posts", path)
+        post = Post.objects.get()
+
+        self.assertEqual(post.created_at, created_at)
+        self.assertEqual(post.updated_at, created_at)
+        self.assertTrue(Post._meta.get_field("created_at").auto_now_add)
+
+    def test_import_continues_after_saved_progress(self):
+        self.import_users("author")
+        path = self.write_rows(
+            "posts.jsonl",
+            ({"user": "author", "text": str(n)} for n in range(5)),
+        )
+        ImportProgress.objects.create(
+            source=os.path.abspath(path), kind="posts", rows=2
+        )
+
+        self.run_import("posts", path)
+
+        self.assertCountEqual(
+            Post.objects.values_list("text", flat=True), ["2", "3", "4"]
+        )
+        self.assertEqual(ImportProgress.objects.get(kind="posts").rows, 5)
+
+        self.run_import("posts", path)
+
+        self.assertEqual(Post.objects.count(), 3)
+
+        self.run_import("posts", path, "--restart")
+
+        self.assertEqual(Post.objects.count(), 8)
+
+    def test_progress_of_another_kind(self):
+        path = self.import_users("author")
 
-# Create your tests here.
+        with self.assertRaises(CommandError):
+            self.run_import("posts", path)
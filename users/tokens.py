@@ -0,0 +1,41 @@
+"""
+Refresh tokens checked against the blacklist through a Bloom filter.
+
+Most refresh and verify requests carry tokens that are not blacklisted,
+which the filter of blacklisted token ids answers without a query. Ids
+are added as they are blacklisted, before the transaction commits, and
+the filter is rebuilt from the unexpired blacklisted tokens by
+`users.tasks.rebuild_token_blacklist_filter`, which also creates it.
+"""
+import functools
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from core.bloom import BloomFilter
+
+
+@functools.lru_cache(maxsize=None)
+def get_blacklist_filter() -> BloomFilter:
+    return BloomFilter(
+        "token-blacklist",
+        settings.TOKEN_BLACKLIST_FILTER_SIZE,
+        settings.TOKEN_BLACKLIST_FILTER_HASHES,
+    )
+
+
+def is_blacklisted(jti: str) -> bool:
+    if get_blacklist_filter().contains(jti) is False:
+        return False
+
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+class RefreshToken(tokens.RefreshToken):
+    def check_blacklist(self) -> None:
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
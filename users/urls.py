@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from rest_framework_simplejwt.views import (
@@ -7,7 +8,7 @@ from rest_framework_simplejwt.views import (
     TokenBlacklistView,
 )
 
-from . import views
+from . import async_views, views
 
 
 urlpatterns = [
@@ -27,6 +28,21 @@ urlpatterns = [
         views.ManageProfilePictureView.as_view(),
         name="upload-profile-picture",
     ),
+    path(
+        "me/following/",
+        views.FollowBatchView.as_view(),
+        name="follow-batch",
+    ),
+    path(
+        "me/relationships/",
+        views.RelationshipListView.as_view(),
+        name="relationships",
+    ),
+    path(
+        "me/recommendations/",
+        views.FollowRecommendationListView.as_view(),
+        name="follow-recommendations",
+    ),
     path("profiles/", views.ProfileListView.as_view(), name="profile-list"),
     path(
         "profiles/<int:pk>/",
@@ -55,4 +71,14 @@ urlpatterns = [
     ),
 ]
 
+if settings.ASYNC_READS:
+    urlpatterns.insert(
+        0,
+        path(
+            "profiles/<int:pk>/",
+            async_views.ProfileDetailAsyncView.as_view(),
+            name="profile-detail",
+        ),
+    )
+
 app_name = "users"
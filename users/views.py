@@ -1,5 +1,12 @@
+import functools
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
@@ -9,23 +16,71 @@ from drf_spectacular.utils import (
     OpenApiParameter,
 )
 
-from .models import Profile
+from . import follows
+from .models import Follow, FollowRecommendation, Profile
+from .search import country_code, get_profile_search_backend
 from .serializers import (
+    FollowBatchSerializer,
     FollowerListSerializer,
     FollowingListSerializer,
+    FollowRecommendationSerializer,
     ProfileListSerializer,
     ProfilePictureSerializer,
     ProfileRetrieveSerializer,
     ProfileSerializer,
+    RelationshipSerializer,
     UserSerializer,
     UserSignUpSerializer,
 )
-from core.pagination import StandardResultSetPagination
-from core.serializers import EmptySerializer
+from .tasks import process_profile_picture
+from core.cache import cached_response, conditional_response
+from core.images import delete_variants
+from core.routers import ReplicaReadMixin
+from core.pagination import KeysetPagination, StandardResultSetPagination
+from core.serializers import EmptySerializer, IdsQuerySerializer
 from posts.models import Post
 from posts.serializers import PostListSerializer
 
 
+def get_profile_owner(profile_id) -> int | None:
+    """
+    Return the id of the user owning a profile.
+    Profiles never change owners, so the mapping is cached indefinitely.
+    """
+    key = f"profile-owner:{profile_id}"
+    user_id = cache.get(key)
+
+    if user_id is None:
+        user_id = (
+            Profile.objects.filter(pk=profile_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+
+        if user_id is not None:
+            cache.set(key, user_id, timeout=None)
+
+    return user_id
+
+
+async def aget_profile_owner(profile_id) -> int | None:
+    """Asynchronous version of `get_profile_owner`"""
+    key = f"profile-owner:{profile_id}"
+    user_id = await cache.aget(key)
+
+    if user_id is None:
+        user_id = await (
+            Profile.objects.filter(pk=profile_id)
+            .values_list("user_id", flat=True)
+            .afirst()
+        )
+
+        if user_id is not None:
+            await cache.aset(key, user_id, timeout=None)
+
+    return user_id
+
+
 class SignUpView(generics.GenericAPIView):
     """
     Create a new account
@@ -56,10 +111,11 @@ class ManageAccountView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        # The authenticated user has only its cached fields loaded
+        return get_user_model().objects.get(pk=self.request.user.pk)
 
 
-class ManageProfileView(generics.RetrieveUpdateAPIView):
+class ManageProfileView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     """
     Retrieve or update current user's profile
     """
@@ -67,7 +123,9 @@ class ManageProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user.profile
+        return Profile.objects.select_related("user", "stats").get(
+            user=self.request.user
+        )
 
     def get_serializer_class(self):
         if self.request.method.lower() == "get":
@@ -76,7 +134,7 @@ class ManageProfileView(generics.RetrieveUpdateAPIView):
         return ProfileSerializer
 
 
-class ManageProfilePictureView(generics.UpdateAPIView):
+class ManageProfilePictureView(ReplicaReadMixin, generics.UpdateAPIView):
     """
     Update current user's profile picture
     """
@@ -85,10 +143,24 @@ class ManageProfilePictureView(generics.UpdateAPIView):
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user.profile
+        return Profile.objects.get(user=self.request.user)
+
+    def perform_update(self, serializer):
+        previous = serializer.instance.picture.name
+        previous_variants = serializer.instance.picture_variants
+        profile = serializer.save(picture_variants={})
 
+        # Release the replaced files after the new ones are referenced,
+        # so a re-uploaded picture keeps its shared blob
+        if previous:
+            default_storage.delete(previous)
+        delete_variants(previous_variants)
 
-class ProfileListView(generics.ListAPIView):
+        if profile.picture:
+            process_profile_picture.delay(profile.id)
+
+
+class ProfileListView(ReplicaReadMixin, generics.ListAPIView):
     """
     List user profiles
     """
@@ -98,6 +170,15 @@ class ProfileListView(generics.ListAPIView):
     permission_classes = (AllowAny,)
     pagination_class = StandardResultSetPagination
 
+    @property
+    def throttle_scope(self):
+        params = self.request.query_params
+
+        if params.get("username") or params.get("bio"):
+            return "search"
+
+        return None
+
     def get_queryset(self):
         queryset = self.queryset.all()
 
@@ -108,16 +189,20 @@ class ProfileListView(generics.ListAPIView):
         bio = self.request.query_params.get("bio")
         country = self.request.query_params.get("country")
 
-        if username:
-            queryset = queryset.filter(user__username__icontains=username)
-
-        if bio:
-            queryset = queryset.filter(bio__icontains=bio)
-
         if country:
-            queryset = queryset.filter(country__icontains=country)
+            code = country_code(country)
+            queryset = (
+                queryset.filter(country=code) if code else queryset.none()
+            )
+
+        if username or bio:
+            return get_profile_search_backend().search(
+                queryset,
+                username=username,
+                bio=bio,
+            )
 
-        return queryset
+        return queryset.order_by("pk")
 
     @extend_schema(
         parameters=[
@@ -134,25 +219,51 @@ class ProfileListView(generics.ListAPIView):
             OpenApiParameter(
                 "country",
                 type=str,
-                description="Filter by country name",
+                description="Filter by country name or code",
             ),
         ]
     )
     def get(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        build = functools.partial(super().list, request, *args, **kwargs)
+        params = request.query_params
 
+        # Only the first page of the unfiltered list is cached
+        if any(
+            param in params for param in ("username", "bio", "country")
+        ) or params.get("page", "1") != "1":
+            return conditional_response(
+                request,
+                "profiles",
+                (("profiles",),),
+                build,
+                request.get_full_path(),
+            )
 
-class ProfileDetailView(generics.RetrieveAPIView):
+        return cached_response(request, "profiles", (("profiles",),), build)
+
+
+class ProfileDetailView(ReplicaReadMixin, generics.RetrieveAPIView):
     """
     Retrieve user profile
     """
 
-    queryset = Profile.objects.select_related("user")
+    queryset = Profile.objects.select_related("user", "stats")
     serializer_class = ProfileRetrieveSerializer
     permission_classes = (AllowAny,)
 
+    def get(self, request, *args, **kwargs):
+        build = functools.partial(super().get, request, *args, **kwargs)
+        user_id = get_profile_owner(kwargs["pk"])
+
+        if user_id is None:
+            return build()
+
+        return cached_response(
+            request, "profile", (("profile", user_id),), build
+        )
+
 
-class ProfileFollowView(generics.GenericAPIView):
+class ProfileFollowView(ReplicaReadMixin, generics.GenericAPIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = EmptySerializer
 
@@ -163,16 +274,9 @@ class ProfileFollowView(generics.GenericAPIView):
         """
         Follow profile
         """
-        user_profile = request.user.profile
         target = self.get_object(pk)
 
-        if (
-            user_profile != target
-            and user_profile not in target.followers.all()
-        ):
-            target.followers.add(user_profile)
-            target.save()
-
+        if follows.follow(request.user.profile, (target.pk,)):
             return Response({}, status=status.HTTP_200_OK)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -181,49 +285,171 @@ class ProfileFollowView(generics.GenericAPIView):
         """
         Unfollow profile
         """
-        user_profile = request.user.profile
         target = self.get_object(pk)
 
-        if user_profile != target and user_profile in target.followers.all():
-            target.followers.remove(user_profile)
-            target.save()
-
+        if follows.unfollow(request.user.profile, (target.pk,)):
             return Response({}, status=status.HTTP_200_OK)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class FollowerListView(generics.RetrieveAPIView):
+class FollowBatchView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Follow and unfollow many profiles at once, e.g. on contact import
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = FollowBatchSerializer
+
+    @extend_schema(responses=FollowBatchSerializer)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        profile = request.user.profile
+
+        data = {
+            "follow": follows.follow(
+                profile, serializer.validated_data.get("follow", [])
+            ),
+            "unfollow": follows.unfollow(
+                profile, serializer.validated_data.get("unfollow", [])
+            ),
+        }
+
+        return Response(self.get_serializer(data).data)
+
+
+class RelationshipListView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Retrieve whether the current user follows and is followed by
+    each of the profiles
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = RelationshipSerializer
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                type={"type": "list", "items": {"type": "integer"}},
+                description="Comma-separated profile ids, at most 100",
+                required=True,
+            ),
+        ],
+        responses=RelationshipSerializer(many=True),
+    )
+    def get(self, request, *args, **kwargs):
+        query = IdsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        states = follows.relationships(
+            request.user.profile, query.validated_data["ids"]
+        )
+
+        return Response(self.get_serializer(states, many=True).data)
+
+
+class FollowRecommendationListView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    List profiles suggested for the current user to follow,
+    precomputed from the follows of the profiles they follow
+    """
+
+    serializer_class = FollowRecommendationSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+
+    def get_queryset(self):
+        # Candidates followed since the last computation are left out
+        followed = Follow.objects.filter(
+            profile_id=OuterRef("candidate_id"),
+            follower__user_id=self.request.user.id,
+        )
+
+        return (
+            FollowRecommendation.objects.filter(
+                profile__user_id=self.request.user.id
+            )
+            .filter(~Exists(followed))
+            .select_related("candidate__user")
+            .order_by("rank")
+        )
+
+
+class FollowEdgeListView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    Base view listing the follow edges of a profile,
+    most recent first and paged by follow time
+    """
+
+    permission_classes = (AllowAny,)
+    pagination_class = KeysetPagination
+    # Side of the edge matching the profile and the one listed
+    profile_field = None
+    listed_field = None
+
+    def get_queryset(self):
+        return Follow.objects.filter(
+            **{self.profile_field: self.kwargs["pk"]}
+        ).select_related(f"{self.listed_field}__user")
+
+    def get(self, request, *args, **kwargs):
+        user_id = get_profile_owner(kwargs["pk"])
+
+        if user_id is None:
+            raise NotFound()
+
+        # Following changes bump the profile, renames bump the profiles
+        return conditional_response(
+            request,
+            "follows",
+            (("profile", user_id), ("profiles",)),
+            functools.partial(super().get, request, *args, **kwargs),
+            request.get_full_path(),
+        )
+
+
+class FollowerListView(FollowEdgeListView):
     """
     List user's followers
     """
-    queryset = Profile.objects.prefetch_related("followers__user")
+
     serializer_class = FollowerListSerializer
-    permission_classes = (AllowAny,)
-    pagination_class = StandardResultSetPagination
+    profile_field = "profile_id"
+    listed_field = "follower"
 
 
-class FollowingListView(generics.RetrieveAPIView):
+class FollowingListView(FollowEdgeListView):
     """
     List user's following
     """
-    queryset = Profile.objects.prefetch_related("following__user")
+
     serializer_class = FollowingListSerializer
-    permission_classes = (AllowAny,)
-    pagination_class = StandardResultSetPagination
+    profile_field = "follower_id"
+    listed_field = "profile"
 
 
-class PostsListView(generics.ListAPIView):
+class PostsListView(ReplicaReadMixin, generics.ListAPIView):
     """
     List user's posts
     """
     queryset = Post.objects.filter(published=True)
     serializer_class = PostListSerializer
     permission_classes = (AllowAny,)
-    pagination_class = StandardResultSetPagination
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = self.queryset
         profile_id = self.kwargs.get("pk")
         user = Profile.objects.get(pk=profile_id).user
-        return queryset.filter(user=user)
+        return queryset.filter(user=user).defer("search_vector")
+
+    def get(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            "profile-posts",
+            (("posts",),),
+            functools.partial(super().get, request, *args, **kwargs),
+            request.get_full_path(),
+        )